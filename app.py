@@ -1,19 +1,31 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import altair as alt
-import folium
-from streamlit_folium import folium_static
+import streamlit.components.v1 as components
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from folium.plugins import MarkerCluster
-import plotly.graph_objects as go
+import json
 import os
-from datetime import datetime
 import random
 
+from penguins import (
+    charts,
+    climate,
+    comments,
+    correlations,
+    derived,
+    figure_cache,
+    ingest,
+    morphometrics,
+    panel,
+    ranking,
+    references,
+    timing,
+    trend_models,
+    trends,
+)
 
-trend_model = LinearRegression()
+# Plotting and mapping libraries are imported by the sections that use them
+# (see timing.timed_import), so a cold start on Introduction does not pay for
+# folium, altair or plotly.graph_objects
 
 
 # Set page config
@@ -25,6 +37,16 @@ st.set_page_config(
 if "explored_sections" not in st.session_state:
     st.session_state.explored_sections = []
 
+# Hot-path instrumentation is opt-in per session (?profile=1, or
+# PENGUIN_PROFILE=1 for every session); see the developer panel in the sidebar
+if os.environ.get("PENGUIN_PROFILE") or st.query_params.get("profile"):
+    if "profile" not in st.session_state:
+        st.session_state.profile = timing.Profile()
+    st.session_state.profile.start_run()
+    timing.activate(st.session_state.profile)
+else:
+    timing.activate(None)
+
 # Sidebar navigation
 st.sidebar.title("🐧 Penguin Explorer")
 
@@ -121,42 +143,130 @@ st.markdown(
 )
 
 
+DATA_FILE = "./AllCounts_V_4_1.csv"
+SIZE_FILE = "./cleaned_penguins.csv"
+COMMENTS_PAGE_SIZE = int(os.environ.get("PENGUIN_COMMENTS_PAGE_SIZE", 10))
+# Pages of comments a session keeps rendered before dropping the far end
+COMMENTS_WINDOW_PAGES = int(os.environ.get("PENGUIN_COMMENTS_WINDOW_PAGES", 5))
+# Megabytes of chart JSON kept for all sessions (see load_figure_cache)
+FIGURE_CACHE_MB = int(os.environ.get("PENGUIN_FIGURE_CACHE_MB", 64))
+
+
 # Load data
-@st.cache_data
-def load_data():
-    df = pd.read_csv("./AllCounts_V_4_1.csv")
-    return df
+# Each section calls the loaders it needs, so nothing is read or built until
+# a section that uses it is opened
+#
+# Dataset frames are memory-mapped from the ingest cache that every worker on
+# the host shares.  They are read-only, so one object per process serves all
+# sessions (st.cache_resource) instead of a pickled copy per rerun, and only
+# the current release is held.
+shared_cache = st.cache_resource(max_entries=1)
 
 
-df = load_data()
+# Charts are cached as JSON keyed by (chart, dataset version, widget values)
+# and replayed with figures.from_json.  Keys multiply with the widgets, so the
+# cache is shared by every session and evicts the least recently used charts
+# beyond FIGURE_CACHE_MB instead of growing like st.cache_data.
+@st.cache_resource
+def load_figure_cache():
+    return figure_cache.FigureCache(FIGURE_CACHE_MB * 2**20)
 
 
-# Load data
-@st.cache_data
-def load_climate_data():
-    df = pd.read_csv(
-        "Indicator_3_1_Climate_Indicators_Annual_Mean_Global_Surface_Temperature_577579683071085080.csv"
+chart_cache = load_figure_cache()
+
+
+@timing.timed_load("dataset version")
+def load_data_version():
+    return ingest.dataset_version(DATA_FILE)
+
+
+@timing.timed_load("penguin counts", cache=shared_cache, shared=True)
+def load_data(version):
+    # version is only part of the cache key; the shared Arrow cache is
+    # rebuilt by ingest.ensure_cache whenever the CSV content changes
+    return ingest.load_observations(DATA_FILE)
+
+
+@timing.timed_load("references", cache=shared_cache, shared=True)
+def load_references(version):
+    return ingest.load_references(DATA_FILE)
+
+
+@timing.timed_load("derived metrics", cache=st.cache_data)
+def load_derived_metrics(version):
+    return derived.build_derived_metrics(load_data(version))
+
+
+@timing.timed_load("trend tables", cache=shared_cache, shared=True)
+def load_trend_tables(version):
+    return ingest.load_trend_tables(DATA_FILE)
+
+
+@timing.timed_load("site cube", cache=shared_cache, shared=True)
+def load_cube(version):
+    # Maintained by ingest, incrementally when a new release is a small delta
+    return ingest.load_cube(DATA_FILE)
+
+
+@timing.timed_load("trend models", cache=shared_cache, shared=True)
+def load_trend_models(version):
+    return trend_models.build_trend_models(load_cube(version).cells)
+
+
+@timing.timed_load("population panel", cache=shared_cache, shared=True)
+def load_panel(version):
+    # Every (site, species) imputed for every year around its surveys, so
+    # yearly totals no longer swing with which sites happened to be surveyed
+    return panel.build_panel(
+        load_cube(version).cells, load_trend_models(version).by_site_species
+    )
+
+
+@timing.timed_load("site ranking", cache=shared_cache, shared=True)
+def load_site_ranking(version):
+    site_cube = load_cube(version)
+    return ranking.build_ranking_index(
+        site_cube.by_site,
+        site_cube.by_site_species,
+        load_trend_tables(version).by_site,
+        ingest.load_rankings(DATA_FILE),
     )
-    return df
 
 
-df_climate = load_climate_data()
+# Load climate data
+@timing.timed_load("climate version")
+def load_climate_version():
+    return climate.climate_version()
 
 
-# Extract relevant data for Antarctica
-antarctica_data = df_climate[df_climate["Country"] == "Antarctica"]
+@timing.timed_load("climate store", cache=shared_cache, shared=True)
+def load_climate_store(version):
+    return climate.load_climate_store()
 
-# Adjust the column names to fit the requirements
-years = [str(year) for year in range(1961, 2024)]
-temperature_data = antarctica_data[["Indicator"] + years].melt(
-    id_vars=["Indicator"], var_name="year", value_name="temperature"
-)
+
+@timing.timed_load("climate matrix", cache=shared_cache, shared=True)
+def load_climate_matrix(version):
+    return climate.build_climate_matrix(load_climate_store(version))
+
+
+@timing.timed_load("climate correlations", cache=shared_cache, shared=True)
+def load_climate_correlations(data_version, climate_version):
+    return correlations.build_correlations(
+        load_panel(data_version),
+        load_cube(data_version).sites,
+        load_climate_matrix(climate_version),
+    )
 
 
 # Main content
 st.title("Penguin Population Dynamics: A Journey Through Antarctic Colonies")
 
 if current_section == "Introduction":
+    px = timing.timed_import("plotly.express")
+    figures = timing.timed_import("penguins.figures")
+    data_version = load_data_version()
+    site_cube = load_cube(data_version)
+
     st.header("Antarctic Penguin Population Dynamics")
 
     # Main introduction
@@ -181,11 +291,11 @@ if current_section == "Introduction":
     st.subheader("Penguin Census")
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total Penguin Count", f"{df['penguin_count'].sum():,}")
+        st.metric("Total Penguin Count", f"{site_cube.by_species['sum'].sum():,}")
     with col2:
-        st.metric("Number of Species", df["common_name"].nunique())
+        st.metric("Number of Species", len(site_cube.by_species))
     with col3:
-        st.metric("Number of Sites", df["site_name"].nunique())
+        st.metric("Number of Sites", len(site_cube.sites))
 
     # Detailed introduction
     st.write(
@@ -216,12 +326,18 @@ if current_section == "Introduction":
     wild_penguins = 40000000
     zoo_penguins = 4000
 
-    fig = px.pie(
-        values=[wild_penguins, zoo_penguins],
-        names=["Wild", "Zoos"],
-        title="Estimated Global Penguin Population Distribution",
+    @timing.timed_load("population share chart", cache=chart_cache)
+    def population_share_chart(wild_penguins, zoo_penguins):
+        fig = px.pie(
+            values=[wild_penguins, zoo_penguins],
+            names=["Wild", "Zoos"],
+            title="Estimated Global Penguin Population Distribution",
+        )
+        return fig.to_json()
+
+    st.plotly_chart(
+        figures.from_json(population_share_chart(wild_penguins, zoo_penguins))
     )
-    st.plotly_chart(fig)
 
     st.write(
         f"""
@@ -267,6 +383,8 @@ if current_section == "Introduction":
     )
 
 elif current_section == "Species Overview":
+    figures = timing.timed_import("penguins.figures")
+
     st.header("Species Overview")
     st.write(
         """
@@ -278,14 +396,21 @@ Select a species below to uncover its secrets and see how it's faring in today's
 """
     )
 
-    # Load the penguin size data
-    @st.cache_data
-    def load_size_data():
-        return pd.read_csv("cleaned_penguins.csv")
+    # Summarised once per version of the size data; switching species only
+    # reads the summary and the cached chart JSON
+    @timing.timed_load("species summaries", cache=shared_cache, shared=True)
+    def load_species_summaries(version):
+        return morphometrics.build_summaries(ingest.load_frame(SIZE_FILE))
+
+    @timing.timed_load("species chart", cache=chart_cache)
+    def species_chart(version, species, chart):
+        summary = load_species_summaries(version)[species]
+        return figures.species_figure(chart, species, summary).to_json()
 
-    size_df = load_size_data()
+    size_version = ingest.dataset_version(SIZE_FILE, ingest.single_frame)
+    species_summaries = load_species_summaries(size_version)
 
-    species = st.selectbox("Select a penguin species", size_df["species"].unique())
+    species = st.selectbox("Select a penguin species", list(species_summaries))
 
     st.subheader(f"About {species.title()} Penguins")
 
@@ -422,96 +547,48 @@ Select a species below to uncover its secrets and see how it's faring in today's
     else:
         st.write("Information not available for this species.")
 
-    # Filter data for the given species
-    species_data = size_df[size_df["species"] == species]
-
-    # Check if there is data available for the given species and relevant measurements are present
-    if (
-        not species_data.empty
-        and species_data[
-            ["culmen_length_mm", "culmen_depth_mm", "flipper_length_mm", "body_mass_g"]
-        ]
-        .notnull()
-        .any()
-        .any()
-    ):
+    summary = species_summaries[species]
+    if summary is not None:
         # Population trend chart
         st.subheader("Size Distribution")
-        fig = px.box(
-            species_data.dropna(
-                subset=[
-                    "culmen_length_mm",
-                    "culmen_depth_mm",
-                    "flipper_length_mm",
-                    "body_mass_g",
-                ]
-            ),
-            y=[
-                "culmen_length_mm",
-                "culmen_depth_mm",
-                "flipper_length_mm",
-                "body_mass_g",
-            ],
-            title=f"Size Distribution of {species} Penguins",
-            labels={"value": "Measurement", "variable": "Attribute"},
+        st.plotly_chart(
+            figures.from_json(species_chart(size_version, species, "sizes"))
         )
-        st.plotly_chart(fig)
 
         # Size comparison
         st.subheader("Average Measurements")
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Avg Body Mass (g)", f"{species_data['body_mass_g'].mean():.0f}")
+            st.metric("Avg Body Mass (g)", f"{summary.means['body_mass_g']:.0f}")
         with col2:
             st.metric(
                 "Avg Flipper Length (mm)",
-                f"{species_data['flipper_length_mm'].mean():.1f}",
+                f"{summary.means['flipper_length_mm']:.1f}",
             )
         with col3:
             st.metric(
-                "Avg Bill Length (mm)", f"{species_data['culmen_length_mm'].mean():.1f}"
+                "Avg Bill Length (mm)", f"{summary.means['culmen_length_mm']:.1f}"
             )
         with col4:
-            st.metric(
-                "Avg Bill Depth (mm)", f"{species_data['culmen_depth_mm'].mean():.1f}"
-            )
+            st.metric("Avg Bill Depth (mm)", f"{summary.means['culmen_depth_mm']:.1f}")
 
         # Gender distribution
         st.subheader("Gender Distribution")
-        gender_dist = (
-            species_data["sex"]
-            .map({0: "Unknown", 1: "Female", 2: "Male"})
-            .value_counts()
+        st.plotly_chart(
+            figures.from_json(species_chart(size_version, species, "sexes"))
         )
-        fig = px.pie(
-            values=gender_dist.values,
-            names=gender_dist.index,
-            title=f"Gender Distribution of {species} Penguins",
-        )
-        st.plotly_chart(fig)
 
         # Island distribution
         st.subheader("Island Distribution")
-        island_dist = species_data["island"].value_counts()
-        fig = px.bar(
-            x=island_dist.index,
-            y=island_dist.values,
-            title=f"Distribution of {species} Penguins Across Islands",
+        st.plotly_chart(
+            figures.from_json(species_chart(size_version, species, "islands"))
         )
-        st.plotly_chart(fig)
 
         # Correlation heatmap
         st.subheader("Correlation Between Measurements")
-        corr = species_data[
-            ["culmen_length_mm", "culmen_depth_mm", "flipper_length_mm", "body_mass_g"]
-        ].corr()
-        fig = px.imshow(
-            corr,
-            text_auto=True,
-            aspect="auto",
-            title=f"Correlation Heatmap for {species} Penguins",
-        )
-        st.plotly_chart(fig)
+        st.plotly_chart(
+            figures.from_json(species_chart(size_version, species, "correlation"))
+        )
     else:
         st.write("No data available for this species.")
 
@@ -645,6 +722,14 @@ Select a species below to uncover its secrets and see how it's faring in today's
     )
 
 elif current_section == "Site Analysis":
+    px = timing.timed_import("plotly.express")
+    alt = timing.timed_import("altair")
+    maps = timing.timed_import("penguins.maps")
+    figures = timing.timed_import("penguins.figures")
+    data_version = load_data_version()
+    df = load_data(data_version)
+    site_cube = load_cube(data_version)
+
     st.header("Site Analysis")
     st.write(
         """
@@ -657,112 +742,104 @@ Let's dive into the data and uncover the geographic patterns of penguin populati
     )
 
     # Load and preprocess data
-    @st.cache_data
-    def load_site_data():
-        site_data = (
-            df.groupby(
-                [
-                    "site_name",
-                    "latitude_epsg_4326",
-                    "longitude_epsg_4326",
-                    "common_name",
-                ]
-            )["penguin_count"]
-            .sum()
-            .reset_index()
+    @timing.timed_load("site data", cache=st.cache_data)
+    def load_site_data(version):
+        site_cube = load_cube(version)
+        site_data = site_cube.by_site_species.reset_index().rename(
+            columns={"sum": "penguin_count", "site_total": "total_count"}
+        )
+        site_totals = site_cube.by_site.reset_index().rename(
+            columns={"sum": "total_count"}
         )
-        site_data["total_count"] = site_data.groupby("site_name")[
-            "penguin_count"
-        ].transform("sum")
-        return site_data
+        return site_data, site_totals
 
-    site_data = load_site_data()
+    site_data, site_totals = load_site_data(data_version)
 
     st.subheader("Penguin Colony Locations")
 
     # Dark mode toggle, default is True (dark mode)
     dark_mode = st.toggle("Light Mode", value=False)
 
-    # Choose tile based on dark mode
-    tile = "CartoDB positron" if dark_mode else "CartoDB dark_matter"
-
-    m = folium.Map(location=[-77, 0], zoom_start=3, tiles=tile)
-
-    # Create a MarkerCluster
-    marker_cluster = MarkerCluster()
-
-    epsilon = 1e-10
-
-    # Add markers for each unique site, with size based on population
-    for _, site in site_data.drop_duplicates("site_name").iterrows():
-        total_count = site["total_count"] + epsilon  # Add epsilon to avoid log(0)
-        radius = np.log(total_count) * 2  # Adjust size based on population
-
-        folium.CircleMarker(
-            location=[site["latitude_epsg_4326"], site["longitude_epsg_4326"]],
-            radius=radius,
-            popup=f"<b>{site['site_name']}</b><br>Total Penguin Count: {site['total_count']:,}",
-            color="lightblue" if not dark_mode else "blue",
-            fill=True,
-            fill_color="lightblue" if not dark_mode else "blue",
-            fill_opacity=0.7,
-            weight=2,
-        ).add_to(marker_cluster)
-
-    marker_cluster.add_to(m)
-
-    # Add a legend
-    legend_html = f"""
-    <div style="position: fixed; bottom: 50px; left: 50px; width: 120px; height: 90px; 
-        border:2px solid grey; z-index:9999; font-size:14px;
-        background-color:rgba({255 if dark_mode else 0}, {255 if dark_mode else 0}, {255 if dark_mode else 0}, 0.8);">
-        <p style="margin-top: 5px; margin-bottom: 5px; margin-left: 5px; color: {'black' if dark_mode else 'white'};">
-        <strong>Legend</strong><br>
-        • Small Colony<br>
-        •• Medium Colony<br>
-        ••• Large Colony
-        </p>
-    </div>
-    """
-    m.get_root().html.add_child(folium.Element(legend_html))
+    map_view = st.radio(
+        "Map view", ["Colony totals", "All observations"], horizontal=True
+    )
+
+    # The rendered maps only depend on the data and the tile choice, so other
+    # widgets on this page reuse the cached HTML
+    @timing.timed_load("colony map", cache=st.cache_data)
+    def load_colony_map(version, light):
+        _, site_totals = load_site_data(version)
+        return maps.render_colony_map(site_totals, light)
+
+    @timing.timed_load("observation map", cache=st.cache_data)
+    def load_observation_map(version, light):
+        return maps.render_observation_map(load_data(version), light)
 
     # Display the map
-    folium_static(m, width=800, height=600)
+    if map_view == "Colony totals":
+        with timing.block("map build"):
+            components.html(
+                load_colony_map(data_version, dark_mode),
+                width=maps.MAP_WIDTH,
+                height=maps.MAP_HEIGHT + 10,
+            )
 
-    st.write(
+        st.write(
+            """
+        This map shows the locations of various penguin colonies across Antarctica. 
+        Each blue circle represents a unique site where penguin populations have been observed and counted. 
+        The size of the circle is proportional to the total penguin population at that site.
+        Click on a circle to see the site name and the total penguin count at that location.
         """
-    This map shows the locations of various penguin colonies across Antarctica. 
-    Each blue circle represents a unique site where penguin populations have been observed and counted. 
-    The size of the circle is proportional to the total penguin population at that site.
-    Click on a circle to see the site name and the total penguin count at that location.
-    """
-    )
+        )
+    else:
+        with timing.block("map build"):
+            components.html(
+                load_observation_map(data_version, dark_mode),
+                width=maps.MAP_WIDTH,
+                height=maps.MAP_HEIGHT + 10,
+            )
+
+        st.write(
+            """
+        This map shows every individual survey count rather than one total per site, coloured by species. 
+        Use the year slider in the corner of the map to step through the surveys of a single season; 
+        hover over a point to see the species, year and count.
+        """
+        )
 
     # Selector for number of top sites
     num_top_sites = st.slider(
         "Select number of top sites to display", min_value=3, max_value=25, value=10
     )
-    top_sites = (
-        site_data.drop_duplicates("site_name")
-        .nlargest(num_top_sites, "total_count")["site_name"]
-        .tolist()
-    )
+    with timing.block("site aggregation") as block:
+        # Both views are slices of the precomputed ranking
+        site_ranking = load_site_ranking(data_version)
+        top_n_sites = ranking.top_sites(site_ranking, num_top_sites)
+        top_sites = top_n_sites["site_name"].tolist()
+        species_dist = ranking.top_species(site_ranking, num_top_sites)
+        block.scanned(len(top_n_sites) + len(species_dist))
 
     # Top N Sites by Population
     st.subheader(f"Top {num_top_sites} Penguin Colony Sites")
-    top_n_sites = site_data.drop_duplicates("site_name").nlargest(
-        num_top_sites, "total_count"
-    )
 
-    fig = px.bar(
-        top_n_sites,
-        x="site_name",
-        y="total_count",
-        title=f"Top {num_top_sites} Penguin Colony Sites by Population",
-        labels={"site_name": "Site Name", "total_count": "Total Penguin Count"},
+    # Chart JSON is cached per dataset version and slider value (see
+    # load_figure_cache)
+    @timing.timed_load("top sites chart", cache=chart_cache)
+    def top_sites_chart(data_version, num_top_sites, _top_n_sites):
+        fig = px.bar(
+            _top_n_sites,
+            x="site_name",
+            y="total_count",
+            title=f"Top {num_top_sites} Penguin Colony Sites by Population",
+            labels={"site_name": "Site Name", "total_count": "Total Penguin Count"},
+        )
+        fig.update_layout(xaxis_tickangle=-45)
+        return fig.to_json()
+
+    st.plotly_chart(
+        figures.from_json(top_sites_chart(data_version, num_top_sites, top_n_sites))
     )
-    fig.update_layout(xaxis_tickangle=-45)
-    st.plotly_chart(fig)
 
     st.write(
         f"""
@@ -773,22 +850,29 @@ Let's dive into the data and uncover the geographic patterns of penguin populati
 
     # Species Distribution across Top N Sites
     st.subheader(f"Species Distribution in Top {num_top_sites} Sites")
-    species_dist = site_data[site_data["site_name"].isin(top_sites)]
-
-    fig = px.bar(
-        species_dist,
-        x="site_name",
-        y="penguin_count",
-        color="common_name",
-        title=f"Species Distribution in Top {num_top_sites} Penguin Colony Sites",
-        labels={
-            "site_name": "Site Name",
-            "penguin_count": "Penguin Count",
-            "common_name": "Species",
-        },
+
+    @timing.timed_load("species distribution chart", cache=chart_cache)
+    def species_distribution_chart(data_version, num_top_sites, _species_dist):
+        fig = px.bar(
+            _species_dist,
+            x="site_name",
+            y="penguin_count",
+            color="common_name",
+            title=f"Species Distribution in Top {num_top_sites} Penguin Colony Sites",
+            labels={
+                "site_name": "Site Name",
+                "penguin_count": "Penguin Count",
+                "common_name": "Species",
+            },
+        )
+        fig.update_layout(xaxis_tickangle=-45)
+        return fig.to_json()
+
+    st.plotly_chart(
+        figures.from_json(
+            species_distribution_chart(data_version, num_top_sites, species_dist)
+        )
     )
-    fig.update_layout(xaxis_tickangle=-45)
-    st.plotly_chart(fig)
 
     st.write(
         f"""
@@ -802,47 +886,81 @@ Let's dive into the data and uncover the geographic patterns of penguin populati
         "Select sites to compare", df["site_name"].unique(), default=top_sites
     )
 
-    if selected_sites:
-        # Filter data for selected sites
-        comparison_data = df[df["site_name"].isin(selected_sites)]
-
-        # Base chart
-        base = alt.Chart(comparison_data).encode(
-            x="year:O",
-            color="common_name:N",
-            strokeDash="site_name:N",
-            tooltip=["site_name", "common_name", "year", "penguin_count"],
-        )
+    # The spec is cached per dataset version and selection, with its data
+    # inlined, and drawn with st.vega_lite_chart
+    @timing.timed_load("site comparison chart", cache=chart_cache)
+    def site_comparison_chart(data_version, selected_sites, _comparison_data):
+        with timing.block("altair chart spec") as block:
+            # The spec only carries yearly totals per (site, species) and the
+            # endpoints of their precomputed trends, not the surveys themselves
+            chart_data = charts.site_comparison(
+                _comparison_data, load_trend_tables(data_version).by_site_species
+            )
+            block.copied(chart_data.points)
+
+            # Base chart
+            base = alt.Chart(chart_data.points).encode(
+                x="year:O",
+                color="common_name:N",
+                strokeDash="site_name:N",
+                tooltip=["site_name", "common_name", "year", "penguin_count"],
+            )
 
-        # Points
-        points = base.mark_point().encode(
-            y=alt.Y("penguin_count:Q", scale=alt.Scale(type="log")),
-        )
+            # Points
+            points = base.mark_point().encode(
+                y=alt.Y("penguin_count:Q", scale=alt.Scale(type="log")),
+            )
 
-        # Lines
-        lines = base.mark_line().encode(
-            y=alt.Y("penguin_count:Q", scale=alt.Scale(type="log")),
-        )
+            # Lines
+            lines = base.mark_line().encode(
+                y=alt.Y("penguin_count:Q", scale=alt.Scale(type="log")),
+            )
 
-        # Regression lines
-        regression = (
-            base.transform_regression(
-                "year", "penguin_count", groupby=["site_name", "common_name"]
+            # Regression lines
+            regression = (
+                alt.Chart(chart_data.trend_lines)
+                .mark_line(strokeDash=[5, 5])
+                .encode(
+                    x="year:O",
+                    y=alt.Y("penguin_count:Q", scale=alt.Scale(type="log")),
+                    color="common_name:N",
+                    strokeDash="site_name:N",
+                )
             )
-            .mark_line(strokeDash=[5, 5])
-            .encode(
-                y=alt.Y("penguin_count:Q", scale=alt.Scale(type="log")),
+
+            # Combine layers
+            chart = (
+                (points + lines + regression)
+                .properties(width=800, height=600)  # Increased height
+                .interactive()
             )
-        )
 
-        # Combine layers
-        chart = (
-            (points + lines + regression)
-            .properties(width=800, height=600)  # Increased height
-            .interactive()
+            # No theme defaults, as st.altair_chart renders them, and no row
+            # limit on the inlined data
+            with alt.themes.enable("none"), alt.data_transformers.enable(
+                "default", max_rows=None
+            ):
+                return chart.to_json()
+
+    if selected_sites:
+        with timing.block("site comparison filter") as block:
+            # Filter data for selected sites
+            comparison_data = df[df["site_name"].isin(selected_sites)]
+            block.scanned(len(df))
+            block.copied(comparison_data)
+
+        spec = site_comparison_chart(
+            data_version, tuple(selected_sites), comparison_data
         )
+        st.vega_lite_chart(json.loads(spec), use_container_width=True)
 
-        st.altair_chart(chart, use_container_width=True)
+        # Citations are only parsed and loaded when someone asks for them
+        if st.toggle("Show survey sources"):
+            reference_table = load_references(data_version)
+            for text in references.citations(
+                reference_table, comparison_data["reference_id"]
+            ):
+                st.markdown(f"- {text}")
 
     # Summary statistics
     st.subheader("Summary Statistics")
@@ -850,7 +968,7 @@ Let's dive into the data and uncover the geographic patterns of penguin populati
     if selected_sites:
         # Calculate summary statistics
         summary = (
-            comparison_data.groupby("site_name")
+            comparison_data.groupby("site_name", observed=True)
             .agg({"penguin_count": ["mean", "min", "max"], "year": ["min", "max"]})
             .reset_index()
         )
@@ -863,17 +981,11 @@ Let's dive into the data and uncover the geographic patterns of penguin populati
             "Last Year",
         ]
 
-        # Calculate trend for each site
-        for site in selected_sites:
-            site_trend = (
-                comparison_data[comparison_data["site_name"] == site]
-                .groupby("year")["penguin_count"]
-                .sum()
-                .reset_index()
-            )
-            trend_model = LinearRegression()
-            trend_model.fit(site_trend[["year"]], site_trend["penguin_count"])
-            summary.loc[summary["Site"] == site, "Trend"] = trend_model.coef_[0]
+        # Trend of each site's yearly totals, fitted for all sites at once
+        with timing.block("regression fits") as block:
+            site_trends = load_trend_tables(data_version).by_site
+            summary["Trend"] = site_trends["slope"].reindex(summary["Site"]).to_numpy()
+            block.scanned(len(summary))
 
         # Function to color code the counts
         def color_count(val):
@@ -953,28 +1065,30 @@ Let's dive into the data and uncover the geographic patterns of penguin populati
 
         # Trend analysis
         st.subheader("Population Trend Analysis")
-        for site in selected_sites:
-            site_trend = (
-                comparison_data[comparison_data["site_name"] == site]
-                .groupby("year")["penguin_count"]
-                .sum()
-                .reset_index()
-            )
-            trend_model = LinearRegression()
-            trend_model.fit(site_trend[["year"]], site_trend["penguin_count"])
-            trend = "increasing" if trend_model.coef_[0] > 0 else "decreasing"
-            trend_strength = abs(trend_model.coef_[0])
-
-            if trend_strength > 100:
-                strength = "strong"
-            elif trend_strength > 50:
-                strength = "moderate"
+        # Judged on the log scale, by significance and annual rate, with each
+        # site's slope shrunk towards the others by its uncertainty
+        site_models = load_trend_models(data_version).by_site
+        for site, model in site_models.reindex(selected_sites).iterrows():
+            if not model["n"] >= 2:
+                st.markdown(
+                    f"- **{site}** has only been surveyed in one season, so no trend can be estimated."
+                )
+                continue
+            if model["label"] == trend_models.TOO_FEW:
+                st.markdown(
+                    f"- **{site}** has only been surveyed in {model['n']:.0f} seasons, too few to judge its trend."
+                )
+                continue
+
+            interval = f"{model['rate']:+.1%} per year, 95% interval {model['rate_low']:+.1%} to {model['rate_high']:+.1%}"
+            if model["label"] == trend_models.NO_CLEAR_TREND:
+                st.markdown(
+                    f"- The population at **{site}** shows **no clear trend** ({interval})."
+                )
             else:
-                strength = "slight"
-
-            st.markdown(
-                f"- The overall population trend at **{site}** is **{strength}ly {trend}**."
-            )
+                st.markdown(
+                    f"- The overall population trend at **{site}** is **{model['label']}** ({interval})."
+                )
 
         st.write(
             """
@@ -996,33 +1110,26 @@ Let's dive into the data and uncover the geographic patterns of penguin populati
     # Additional Insights
     st.subheader("Additional Insights")
 
+    site_ranking = load_site_ranking(data_version)
+
     # Species Richness
-    species_richness = (
-        df.groupby("site_name")["common_name"].nunique().sort_values(ascending=False)
-    )
+    richest_site = ranking.top_sites(site_ranking, 1, "richness").iloc[0]
     st.write(
-        f"The site with the highest species richness is {species_richness.index[0]} with {species_richness.iloc[0]} different penguin species."
+        f"The site with the highest species richness is {richest_site['site_name']} with {richest_site['species_richness']} different penguin species."
     )
 
     # Most Stable Population
-    population_stability = (
-        df.groupby("site_name")["penguin_count"].std()
-        / df.groupby("site_name")["penguin_count"].mean()
-    )
-    most_stable_site = population_stability.sort_values().index[0]
+    most_stable_site = ranking.top_sites(site_ranking, 1, "stability").iloc[0][
+        "site_name"
+    ]
     st.write(
         f"The site with the most stable penguin population over time is {most_stable_site}."
     )
 
     # Largest Single-Year Change
-    df["year"] = pd.to_datetime(df["year"], format="%Y")
-    df["year_diff"] = df.groupby("site_name")["year"].diff().dt.days / 365.25
-    df["annual_change"] = (
-        df.groupby("site_name")["penguin_count"].diff() / df["year_diff"]
-    )
-    largest_change = df.loc[df["annual_change"].abs().idxmax()]
+    largest_change = load_derived_metrics(data_version).largest_change
     st.write(
-        f"The largest single-year change in penguin population occurred at {largest_change['site_name']} between {largest_change['year'].year - 1} and {largest_change['year'].year}, with a change of {largest_change['annual_change']:.0f} penguins per year."
+        f"The largest single-year change in penguin population occurred at {largest_change['site_name']} between {largest_change['year'] - largest_change['year_diff']} and {largest_change['year']}, with a change of {largest_change['annual_change']:.0f} penguins per year."
     )
 
     # Conservation Implications
@@ -1048,6 +1155,13 @@ Let's dive into the data and uncover the geographic patterns of penguin populati
     )
 
 elif current_section == "Climate Impact":
+    px = timing.timed_import("plotly.express")
+    go = timing.timed_import("plotly.graph_objects")
+    figures = timing.timed_import("penguins.figures")
+    data_version = load_data_version()
+    climate_version = load_climate_version()
+    site_cube = load_cube(data_version)
+
     st.header("Climate Impact")
     st.write(
         """
@@ -1060,49 +1174,55 @@ Let's examine the data to uncover the intricate relationship between climate tre
     )
     st.subheader("Temperature Trends in Antarctica")
 
-    # Ensure temp_data is properly formatted
-    temp_data = temperature_data.groupby("year")["temperature"].mean().reset_index()
-    temp_data["year"] = temp_data["year"].astype(int)
+    # Antarctica's temperature series, looked up from the indexed climate store
+    temp_data = (
+        climate.series(load_climate_store(climate_version), "Antarctica")
+        .astype("float64")
+        .rename("temperature")
+        .reset_index()
+    )
 
     # Perform linear regression on temperature data
-    X = temp_data["year"].values.reshape(-1, 1)
-    y = temp_data["temperature"].values
-    model = LinearRegression()
-    model.fit(X, y)
+    with timing.block("regression fits") as block:
+        temp_trend, temp_intercept, r_squared = trends.linear_fit(
+            temp_data["year"], temp_data["temperature"]
+        )
+        block.scanned(len(temp_data))
 
     # Create prediction line
-    X_pred = np.array([temp_data["year"].min(), temp_data["year"].max()]).reshape(-1, 1)
-    y_pred = model.predict(X_pred)
-
-    fig = px.line(
-        temp_data,
-        x="year",
-        y="temperature",
-        title="Average Annual Temperature in Antarctica",
-    )
-    fig.add_traces(
-        px.line(x=X_pred.flatten(), y=y_pred, color_discrete_sequence=["red"]).data
-    )
-
-    fig.update_layout(
-        yaxis=dict(title="Temperature (°C)"),
-        xaxis=dict(title="Year"),
-        hovermode="x unified",
-        legend=dict(orientation="v", yanchor="top", y=1, xanchor="left", x=0),
-    )
+    X_pred = np.array([temp_data["year"].min(), temp_data["year"].max()])
+    y_pred = temp_intercept + temp_trend * X_pred
+
+    # Chart JSON is cached per version of its data (see load_figure_cache)
+    @timing.timed_load("temperature chart", cache=chart_cache)
+    def temperature_chart(climate_version, _temp_data, _X_pred, _y_pred):
+        fig = px.line(
+            _temp_data,
+            x="year",
+            y="temperature",
+            title="Average Annual Temperature in Antarctica",
+        )
+        fig.add_traces(
+            px.line(x=_X_pred, y=_y_pred, color_discrete_sequence=["red"]).data
+        )
 
-    fig.update_traces(hovertemplate="Year: %{x}<br>Temperature: %{y:.2f}°C")
+        fig.update_layout(
+            yaxis=dict(title="Temperature (°C)"),
+            xaxis=dict(title="Year"),
+            hovermode="x unified",
+            legend=dict(orientation="v", yanchor="top", y=1, xanchor="left", x=0),
+        )
 
-    # Update legend
-    fig.data[0].name = "Actual Temperature"
-    fig.data[1].name = "Linear Trend"
+        fig.update_traces(hovertemplate="Year: %{x}<br>Temperature: %{y:.2f}°C")
 
-    st.plotly_chart(fig)
+        # Update legend
+        fig.data[0].name = "Actual Temperature"
+        fig.data[1].name = "Linear Trend"
+        return fig.to_json()
 
-    # Calculate and display trend information
-    temp_trend = model.coef_[0]
-    temp_intercept = model.intercept_
-    r_squared = model.score(X, y)
+    st.plotly_chart(
+        figures.from_json(temperature_chart(climate_version, temp_data, X_pred, y_pred))
+    )
 
     st.write(
         f"""
@@ -1117,88 +1237,205 @@ Let's examine the data to uncover the intricate relationship between climate tre
     """
     )
 
+    # Climate explorer: any rows of the climate file side by side, sliced out
+    # of the dense (series x year) matrix instead of filtering the whole file
+    st.subheader("Compare Temperature Trends")
+    climate_matrix = load_climate_matrix(climate_version)
+    series_names = climate_matrix.series_info["Country"]
+    compared = st.multiselect(
+        "Countries and regions to compare",
+        series_names.index.tolist(),
+        default=series_names.index[series_names.isin(["Antarctica", "World"])].tolist(),
+        format_func=series_names.get,
+    )
+    first_year, last_year = (int(year) for year in climate_matrix.years[[0, -1]])
+    compared_years = st.slider(
+        "Years to compare", first_year, last_year, (first_year, last_year)
+    )
+
+    @timing.timed_load("temperature comparison chart", cache=chart_cache)
+    def temperature_comparison_chart(
+        climate_version, compared, compared_years, _compared_data
+    ):
+        fig = px.line(
+            _compared_data.reset_index().melt(id_vars="year", value_name="temperature"),
+            x="year",
+            y="temperature",
+            color="Country",
+            title="Average Annual Temperature Change by Country and Region",
+        )
+        fig.update_layout(
+            yaxis=dict(title="Temperature (°C)"),
+            xaxis=dict(title="Year"),
+            hovermode="x unified",
+        )
+        fig.update_traces(hovertemplate="%{y:.2f}°C")
+        return fig.to_json()
+
+    if compared:
+        compared_data = climate.select(climate_matrix, compared, compared_years)
+        st.plotly_chart(
+            figures.from_json(
+                temperature_comparison_chart(
+                    climate_version, tuple(compared), compared_years, compared_data
+                )
+            ),
+            use_container_width=True,
+        )
+
+        # One grouped least-squares pass over every selected series
+        reported = np.isfinite(compared_data.to_numpy())
+        year_grid = np.broadcast_to(
+            compared_data.index.to_numpy()[:, None], reported.shape
+        )
+        series_codes = np.broadcast_to(np.arange(len(compared)), reported.shape)
+        compared_fit = trends.fit_ols(
+            year_grid[reported],
+            compared_data.to_numpy()[reported],
+            series_codes[reported],
+            len(compared),
+        )
+        st.dataframe(
+            pd.DataFrame(
+                {
+                    "Country": compared_data.columns,
+                    "Warming (°C per decade)": compared_fit["slope"] * 10,
+                    "R²": compared_fit["r_squared"],
+                    "Years Reported": compared_fit["n"],
+                }
+            ),
+            hide_index=True,
+            column_config={
+                "Warming (°C per decade)": st.column_config.NumberColumn(format="%.3f"),
+                "R²": st.column_config.NumberColumn(format="%.2f"),
+            },
+        )
+    else:
+        st.info("Select at least one country or region to compare.")
+
     # Total Penguin Population vs Temperature
     st.subheader("Total Penguin Population vs Temperature")
 
-    total_penguin_data = df.groupby("year")["penguin_count"].sum().reset_index()
-    total_penguin_data["year"] = total_penguin_data["year"].astype(int)
+    population_panel = load_panel(data_version)
+    total_penguin_data = population_panel.totals.reset_index()
 
     merged_data = pd.merge(total_penguin_data, temp_data, on="year", how="inner")
 
     # Perform linear regression on penguin data
-    X_penguin = merged_data["year"].values.reshape(-1, 1)
-    y_penguin = merged_data["penguin_count"].values
-    model_penguin = LinearRegression()
-    model_penguin.fit(X_penguin, y_penguin)
+    with timing.block("regression fits") as block:
+        penguin_trend, penguin_intercept, r_squared_penguin = trends.linear_fit(
+            merged_data["year"], merged_data["penguin_count"]
+        )
+        block.scanned(len(merged_data))
 
     # Create prediction line for penguin population
-    X_pred_penguin = np.array(
-        [merged_data["year"].min(), merged_data["year"].max()]
-    ).reshape(-1, 1)
-    y_pred_penguin = model_penguin.predict(X_pred_penguin)
-
-    fig = go.Figure()
+    X_pred_penguin = np.array([merged_data["year"].min(), merged_data["year"].max()])
+    y_pred_penguin = penguin_intercept + penguin_trend * X_pred_penguin
+
+    @timing.timed_load("population chart", cache=chart_cache)
+    def population_chart(
+        data_version,
+        climate_version,
+        _merged_data,
+        _X_pred,
+        _y_pred,
+        _X_pred_penguin,
+        _y_pred_penguin,
+    ):
+        fig = go.Figure()
+
+        # Add temperature data
+        fig.add_trace(
+            go.Scatter(
+                x=_merged_data["year"],
+                y=_merged_data["temperature"],
+                name="Temperature",
+                line=dict(color="red"),
+            )
+        )
 
-    # Add temperature data
-    fig.add_trace(
-        go.Scatter(
-            x=merged_data["year"],
-            y=merged_data["temperature"],
-            name="Temperature",
-            line=dict(color="red"),
+        # Add the 95% band of the imputed totals
+        fig.add_trace(
+            go.Scatter(
+                x=_merged_data["year"],
+                y=_merged_data["upper"],
+                yaxis="y2",
+                line=dict(width=0),
+                showlegend=False,
+                hoverinfo="skip",
+            )
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=_merged_data["year"],
+                y=_merged_data["lower"],
+                name="Penguin Count 95% Band",
+                yaxis="y2",
+                line=dict(width=0),
+                fill="tonexty",
+                fillcolor="rgba(0, 0, 255, 0.15)",
+                hoverinfo="skip",
+            )
         )
-    )
 
-    # Add penguin count data
-    fig.add_trace(
-        go.Scatter(
-            x=merged_data["year"],
-            y=merged_data["penguin_count"],
-            name="Penguin Count",
-            yaxis="y2",
-            line=dict(color="blue"),
+        # Add penguin count data
+        fig.add_trace(
+            go.Scatter(
+                x=_merged_data["year"],
+                y=_merged_data["penguin_count"],
+                name="Penguin Count",
+                yaxis="y2",
+                line=dict(color="blue"),
+            )
         )
-    )
 
-    # Add linear regression for temperature
-    fig.add_trace(
-        go.Scatter(
-            x=X_pred.flatten(),
-            y=y_pred,
-            name="Temperature Trend",
-            line=dict(color="orange", dash="dash"),
+        # Add linear regression for temperature
+        fig.add_trace(
+            go.Scatter(
+                x=_X_pred,
+                y=_y_pred,
+                name="Temperature Trend",
+                line=dict(color="orange", dash="dash"),
+            )
         )
-    )
 
-    # Add linear regression for penguin count
-    fig.add_trace(
-        go.Scatter(
-            x=X_pred_penguin.flatten(),
-            y=y_pred_penguin,
-            name="Penguin Count Trend",
-            yaxis="y2",
-            line=dict(color="green", dash="dash"),
+        # Add linear regression for penguin count
+        fig.add_trace(
+            go.Scatter(
+                x=_X_pred_penguin,
+                y=_y_pred_penguin,
+                name="Penguin Count Trend",
+                yaxis="y2",
+                line=dict(color="green", dash="dash"),
+            )
         )
-    )
 
-    fig.update_layout(
-        title="Temperature and Total Penguin Population Over Time",
-        xaxis=dict(title="Year"),
-        yaxis=dict(title="Temperature (°C)", color="red"),
-        yaxis2=dict(
-            title="Total Penguin Count", overlaying="y", side="right", color="blue"
-        ),
-        legend=dict(x=1.1, y=1, bgcolor="rgba(255, 255, 255, 0.5)"),
-        hovermode="x unified",
+        fig.update_layout(
+            title="Temperature and Total Penguin Population Over Time",
+            xaxis=dict(title="Year"),
+            yaxis=dict(title="Temperature (°C)", color="red"),
+            yaxis2=dict(
+                title="Total Penguin Count", overlaying="y", side="right", color="blue"
+            ),
+            legend=dict(x=1.1, y=1, bgcolor="rgba(255, 255, 255, 0.5)"),
+            hovermode="x unified",
+        )
+        return fig.to_json()
+
+    st.plotly_chart(
+        figures.from_json(
+            population_chart(
+                data_version,
+                climate_version,
+                merged_data,
+                X_pred,
+                y_pred,
+                X_pred_penguin,
+                y_pred_penguin,
+            )
+        )
     )
 
-    st.plotly_chart(fig)
-
-    # Calculate and display trend information for penguin population
-    penguin_trend = model_penguin.coef_[0]
-    penguin_intercept = model_penguin.intercept_
-    r_squared_penguin = model_penguin.score(X_penguin, y_penguin)
-
     st.write(
         f"""
     #### Key observations:
@@ -1207,6 +1444,7 @@ Let's examine the data to uncover the intricate relationship between climate tre
     - The R-squared value for temperature is {r_squared:.4f}.
 
     2. Penguin Population Trend:
+    - Sites are not surveyed every year, so each colony's count is interpolated between its surveys and follows its own trend for up to {panel.MAX_EXTRAPOLATION} years beyond them; further out the colony is left out of the total, so years with few surveys cover fewer colonies. On average {merged_data['observed_share'].mean()*100:.0f}% of a year's total was counted that year; the shaded band shows the 95% uncertainty of the rest.
     - The penguin population is changing at a rate of {penguin_trend:.0f} individuals per year.
     - The R-squared value for penguin population is {r_squared_penguin:.4f}.
     - If this trend continues, we could expect a change of {penguin_trend*10:.0f} individuals over the next decade.
@@ -1219,14 +1457,10 @@ Let's examine the data to uncover the intricate relationship between climate tre
     )
 
     st.subheader("Penguin Population Trends by Species")
-    species = st.selectbox("Select a species", df["common_name"].unique())
-    species_data = (
-        df[df["common_name"] == species]
-        .groupby("year")["penguin_count"]
-        .sum()
-        .reset_index()
-    )
-    species_data["year"] = species_data["year"].astype(int)
+    species = st.selectbox("Select a species", site_cube.by_species.index)
+    # Imputed species totals over the years with temperature records
+    species_data = population_panel.by_species.loc[species].reset_index()
+    species_data = species_data[species_data["year"].isin(temp_data["year"])]
 
     # Filter temperature data to match the range of penguin data
     min_year = species_data["year"].min()
@@ -1235,89 +1469,129 @@ Let's examine the data to uncover the intricate relationship between climate tre
         (temp_data["year"] >= min_year) & (temp_data["year"] <= max_year)
     ]
 
-    # Perform linear regression on species data
-    X_species = species_data["year"].values.reshape(-1, 1)
-    y_species = species_data["penguin_count"].values
-    model_species = LinearRegression()
-    model_species.fit(X_species, y_species)
+    # Perform linear regression on the species and filtered temperature data
+    with timing.block("regression fits") as block:
+        species_trend, species_intercept, r_squared_species = trends.linear_fit(
+            species_data["year"], species_data["penguin_count"]
+        )
+        temp_trend, temp_intercept, r_squared_temp = trends.linear_fit(
+            filtered_temp_data["year"], filtered_temp_data["temperature"]
+        )
+        block.scanned(len(species_data) + len(filtered_temp_data))
 
     # Create prediction line for species population
-    X_pred_species = np.array(
-        [species_data["year"].min(), species_data["year"].max()]
-    ).reshape(-1, 1)
-    y_pred_species = model_species.predict(X_pred_species)
-
-    # Perform linear regression on filtered temperature data
-    X_temp = filtered_temp_data["year"].values.reshape(-1, 1)
-    y_temp = filtered_temp_data["temperature"].values
-    model_temp = LinearRegression()
-    model_temp.fit(X_temp, y_temp)
-    y_pred_temp = model_temp.predict(X_pred_species)
-
-    fig = go.Figure()
-
-    # Add temperature data
-    fig.add_trace(
-        go.Scatter(
-            x=filtered_temp_data["year"],
-            y=filtered_temp_data["temperature"],
-            name="Temperature",
-            line=dict(color="red"),
+    X_pred_species = np.array([min_year, max_year])
+    y_pred_species = species_intercept + species_trend * X_pred_species
+    y_pred_temp = temp_intercept + temp_trend * X_pred_species
+
+    @timing.timed_load("species population chart", cache=chart_cache)
+    def species_population_chart(
+        data_version,
+        climate_version,
+        species,
+        _filtered_temp_data,
+        _species_data,
+        _X_pred_species,
+        _y_pred_temp,
+        _y_pred_species,
+    ):
+        fig = go.Figure()
+
+        # Add temperature data
+        fig.add_trace(
+            go.Scatter(
+                x=_filtered_temp_data["year"],
+                y=_filtered_temp_data["temperature"],
+                name="Temperature",
+                line=dict(color="red"),
+            )
         )
-    )
 
-    # Add species count data
-    fig.add_trace(
-        go.Scatter(
-            x=species_data["year"],
-            y=species_data["penguin_count"],
-            name=f"{species} Count",
-            yaxis="y2",
-            line=dict(color="blue"),
+        # Add the 95% band of the imputed species totals
+        fig.add_trace(
+            go.Scatter(
+                x=_species_data["year"],
+                y=_species_data["upper"],
+                yaxis="y2",
+                line=dict(width=0),
+                showlegend=False,
+                hoverinfo="skip",
+            )
         )
-    )
-
-    # Add linear regression for temperature
-    fig.add_trace(
-        go.Scatter(
-            x=X_pred_species.flatten(),
-            y=y_pred_temp,
-            name="Temperature Trend",
-            line=dict(color="orange", dash="dash"),
+        fig.add_trace(
+            go.Scatter(
+                x=_species_data["year"],
+                y=_species_data["lower"],
+                name=f"{species} Count 95% Band",
+                yaxis="y2",
+                line=dict(width=0),
+                fill="tonexty",
+                fillcolor="rgba(0, 0, 255, 0.15)",
+                hoverinfo="skip",
+            )
         )
-    )
 
-    # Add linear regression for species count
-    fig.add_trace(
-        go.Scatter(
-            x=X_pred_species.flatten(),
-            y=y_pred_species,
-            name=f"{species} Count Trend",
-            yaxis="y2",
-            line=dict(color="green", dash="dash"),
+        # Add species count data
+        fig.add_trace(
+            go.Scatter(
+                x=_species_data["year"],
+                y=_species_data["penguin_count"],
+                name=f"{species} Count",
+                yaxis="y2",
+                line=dict(color="blue"),
+            )
         )
-    )
 
-    fig.update_layout(
-        title=f"Temperature and {species.title()} Population Over Time",
-        xaxis=dict(title="Year"),
-        yaxis=dict(title="Temperature (°C)", color="red"),
-        yaxis2=dict(
-            title=f"{species.title()} Count", overlaying="y", side="right", color="blue"
-        ),
-        legend=dict(x=1.1, y=1, bgcolor="rgba(255, 255, 255, 0.5)"),
-        hovermode="x unified",
-    )
-
-    st.plotly_chart(fig)
+        # Add linear regression for temperature
+        fig.add_trace(
+            go.Scatter(
+                x=_X_pred_species,
+                y=_y_pred_temp,
+                name="Temperature Trend",
+                line=dict(color="orange", dash="dash"),
+            )
+        )
 
-    # Calculate and display trend information for species population
-    species_trend = model_species.coef_[0]
-    species_intercept = model_species.intercept_
-    r_squared_species = model_species.score(X_species, y_species)
+        # Add linear regression for species count
+        fig.add_trace(
+            go.Scatter(
+                x=_X_pred_species,
+                y=_y_pred_species,
+                name=f"{species} Count Trend",
+                yaxis="y2",
+                line=dict(color="green", dash="dash"),
+            )
+        )
 
-    temp_trend = model_temp.coef_[0]
-    r_squared_temp = model_temp.score(X_temp, y_temp)
+        fig.update_layout(
+            title=f"Temperature and {species.title()} Population Over Time",
+            xaxis=dict(title="Year"),
+            yaxis=dict(title="Temperature (°C)", color="red"),
+            yaxis2=dict(
+                title=f"{species.title()} Count",
+                overlaying="y",
+                side="right",
+                color="blue",
+            ),
+            legend=dict(x=1.1, y=1, bgcolor="rgba(255, 255, 255, 0.5)"),
+            hovermode="x unified",
+        )
+        return fig.to_json()
+
+    st.plotly_chart(
+        figures.from_json(
+            species_population_chart(
+                data_version,
+                climate_version,
+                species,
+                filtered_temp_data,
+                species_data,
+                X_pred_species,
+                y_pred_temp,
+                y_pred_species,
+            )
+        )
+    )
 
     st.write(
         f"""
@@ -1345,6 +1619,110 @@ Let's examine the data to uncover the intricate relationship between climate tre
     """
     )
 
+    # Lagged correlations of every (species, region) with every climate
+    # series, computed once per data and climate version
+    st.subheader("Which Regions Respond to Warming?")
+    climate_correlations = load_climate_correlations(data_version, climate_version)
+    climate_series = climate_correlations.climates.reset_index()
+    countries = climate_series["Country"].tolist()
+    country = st.selectbox(
+        "Compare with the temperature of",
+        countries,
+        index=countries.index("Antarctica"),
+    )
+    iso3 = climate_series["ISO3"].iloc[countries.index(country)]
+    region_ranking = correlations.region_ranking(climate_correlations, iso3)
+
+    st.dataframe(
+        region_ranking.rename(
+            columns={
+                "common_name": "Species",
+                "cammlr_region": "CCAMLR Region",
+                "lag": "Lag (years)",
+                "correlation": "Correlation",
+                "years": "Years Compared",
+                "observed_share": "Share Counted",
+            }
+        ),
+        hide_index=True,
+        column_config={
+            "Correlation": st.column_config.NumberColumn(format="%.2f"),
+            "Share Counted": st.column_config.NumberColumn(format="%.2f"),
+        },
+    )
+
+    st.write(
+        f"""
+    Each row compares the year-on-year changes of one species' population in one CCAMLR region with the changes in {country}'s temperature up to {correlations.MAX_LAG} years earlier, 
+    at the lag where the two move together most closely. Populations come from the imputed yearly totals used above, 
+    so a low share counted means most of that series was interpolated between surveys, and its correlation deserves less weight.
+    """
+    )
+
+    pairs = list(
+        region_ranking[["common_name", "cammlr_region"]].itertuples(
+            index=False, name=None
+        )
+    )
+    species_region = st.selectbox(
+        "Species and region",
+        pairs,
+        format_func=lambda pair: f"{pair[0].title()}, region {pair[1]}",
+    )
+
+    @timing.timed_load("lag correlation chart", cache=chart_cache)
+    def lag_correlation_chart(
+        data_version, climate_version, iso3, species_region, _lags
+    ):
+        species, region = species_region
+        fig = px.bar(
+            _lags.reset_index(),
+            x="lag",
+            y="correlation",
+            title=f"{species.title()} in Region {region} by Lag",
+            labels={"lag": "Lag (years)", "correlation": "Correlation"},
+        )
+        fig.update_yaxes(range=[-1, 1])
+        return fig.to_json()
+
+    @timing.timed_load("rolling correlation chart", cache=chart_cache)
+    def rolling_correlation_chart(
+        data_version, climate_version, iso3, species_region, _rolling
+    ):
+        fig = px.line(
+            _rolling.reset_index(),
+            x="year",
+            y="correlation",
+            title=f"{correlations.WINDOW}-Year Rolling Correlation at the Best Lag",
+            labels={"year": "Last Year of Window", "correlation": "Correlation"},
+        )
+        fig.update_yaxes(range=[-1, 1])
+        return fig.to_json()
+
+    col1, col2 = st.columns(2)
+    with col1:
+        lags = correlations.lag_profile(climate_correlations, *species_region, iso3)
+        st.plotly_chart(
+            figures.from_json(
+                lag_correlation_chart(
+                    data_version, climate_version, iso3, species_region, lags
+                )
+            ),
+            use_container_width=True,
+        )
+    with col2:
+        rolling = correlations.rolling_profile(
+            climate_correlations, *species_region, iso3
+        )
+        st.plotly_chart(
+            figures.from_json(
+                rolling_correlation_chart(
+                    data_version, climate_version, iso3, species_region, rolling
+                )
+            ),
+            use_container_width=True,
+        )
+
     st.subheader("Interpreting the Climate-Penguin Relationship")
 
     st.write(
@@ -1573,27 +1951,13 @@ elif current_section == "Conservation":
     """
     )
 
-    # File to store comments
-    COMMENTS_FILE = "penguin_comments.csv"
-
-    # Function to load comments
-    def load_comments():
-        if os.path.exists(COMMENTS_FILE):
-            return pd.read_csv(COMMENTS_FILE)
-        return pd.DataFrame(columns=["Timestamp", "Name", "Comment"])
-
-    # Function to save a comment
-    def save_comment(name, comment):
-        comments_df = load_comments()
-        new_comment = pd.DataFrame(
-            {
-                "Timestamp": [datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
-                "Name": [name if name else "Anonymous"],
-                "Comment": [comment],
-            }
-        )
-        comments_df = pd.concat([comments_df, new_comment], ignore_index=True)
-        comments_df.to_csv(COMMENTS_FILE, index=False)
+    # Comments live in an append-only SQLite store; the schema is created (and
+    # the old penguin_comments.csv imported) once per process
+    @st.cache_resource
+    def init_comment_store():
+        comments.init_store()
+
+    init_comment_store()
 
     # Input fields for new comment
     user_comment = st.text_area("Your comment:", height=150)
@@ -1601,20 +1965,101 @@ elif current_section == "Conservation":
 
     if st.button("Submit Comment"):
         if user_comment:
-            save_comment(user_name, user_comment)
+            with timing.block("comment I/O"):
+                comments.add_comment(user_name, user_comment)
             st.success(
                 f"Thank you{' ' + user_name if user_name else ''} for your comment!"
             )
         else:
             st.warning("Please enter a comment before submitting.")
 
-    # Display existing comments
+    # Display existing comments, one page at a time.  The session keeps a
+    # window of at most COMMENTS_WINDOW_PAGES rendered pages as (id, html)
+    # pairs: "older" fetches one page behind the last and "newer" one page
+    # ahead of the first, and comments past the window's size are dropped
+    # from the other end.  While the window reaches the newest comment, a
+    # rerun fetches the comments posted since
     st.subheader("Recent Comments")
-    comments_df = load_comments()
-    if not comments_df.empty:
-        for _, row in comments_df.iloc[::-1].iterrows():
-            st.text(f"{row['Timestamp']} - {row['Name']}:")
-            st.info(row["Comment"])
-            st.markdown("---")
+    if "comment_feed" not in st.session_state:
+        st.session_state.comment_feed = {
+            "items": [],
+            "has_older": False,
+            "has_newer": False,
+        }
+    feed = st.session_state.comment_feed
+    window = COMMENTS_PAGE_SIZE * COMMENTS_WINDOW_PAGES
+
+    def fetch_comment_page(**cursor):
+        with timing.block("comment I/O") as block:
+            page, more = comments.comment_page(COMMENTS_PAGE_SIZE, **cursor)
+            block.scanned(len(page))
+        return [(row["id"], comments.comment_html(row)) for row in page], more
+
+    def show_older_comments():
+        page, feed["has_older"] = fetch_comment_page(before_id=feed["items"][-1][0])
+        feed["items"].extend(page)
+        if len(feed["items"]) > window:
+            del feed["items"][: len(feed["items"]) - window]
+            feed["has_newer"] = True
+
+    def show_newer_comments():
+        page, feed["has_newer"] = fetch_comment_page(after_id=feed["items"][0][0])
+        feed["items"][:0] = page
+        if len(feed["items"]) > window:
+            del feed["items"][window:]
+            feed["has_older"] = True
+
+    if not feed["items"]:
+        feed["items"], feed["has_older"] = fetch_comment_page()
+    elif not feed["has_newer"]:
+        show_newer_comments()
+
+    if feed["items"]:
+        if feed["has_newer"]:
+            st.button("Show newer comments", on_click=show_newer_comments)
+        st.markdown(
+            comments.feed_html([item for _, item in feed["items"]]),
+            unsafe_allow_html=True,
+        )
+        if feed["has_older"]:
+            st.button("Show older comments", on_click=show_older_comments)
     else:
         st.write("No comments yet. Be the first to share your thoughts!")
+
+
+# Startup timings for operators: open the app with ?timings=1 or set
+# PENGUIN_TIMINGS=1 to see what a cold worker spent on imports and loads
+if os.environ.get("PENGUIN_TIMINGS") or st.query_params.get("timings"):
+    with st.sidebar.expander("Startup timings"):
+        st.dataframe(
+            timing.startup_report(),
+            hide_index=True,
+            column_config={"ms": st.column_config.NumberColumn(format="%.1f")},
+        )
+
+# Developer panel for sessions with instrumentation on: this rerun's blocks
+# and loads, the session's cache hit rates, and an export of every record
+profile = timing.active_profile()
+if profile is not None:
+    with st.sidebar.expander("Developer: hot paths", expanded=True):
+        st.caption(f"Rerun {profile.run}")
+        st.dataframe(
+            profile.run_report(),
+            hide_index=True,
+            column_config={"ms": st.column_config.NumberColumn(format="%.1f")},
+        )
+        st.dataframe(
+            profile.cache_report(),
+            hide_index=True,
+            column_config={"hit_rate": st.column_config.NumberColumn(format="%.2f")},
+        )
+        st.caption(
+            f"Chart cache: {len(chart_cache)} charts, "
+            f"{chart_cache.size / 2**20:.1f} of {FIGURE_CACHE_MB} MB"
+        )
+        st.download_button(
+            "Export JSON", profile.to_json(), "penguin_profile.json", "application/json"
+        )
+        st.download_button(
+            "Export CSV", profile.to_csv(), "penguin_profile.csv", "text/csv"
+        )
@@ -0,0 +1 @@
+"""Benchmarks for the data paths behind each section of app.py."""
@@ -0,0 +1,387 @@
+"""Headless benchmarks for each section's data path.
+
+Every case runs the same pandas/NumPy work as one section of ``app.py``,
+without Streamlit, against a synthetic AllCounts-shaped dataset (see
+:mod:`penguins.synthetic`) sized to a multiple of the real file.  Each
+(case, scale) pair runs in a fresh process so peak RSS belongs to that case
+alone.
+
+Usage::
+
+    python -m benchmarks.run --scales 1 10 100 --output bench.json
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from penguins import (
+    climate,
+    correlations,
+    cube,
+    delta,
+    derived,
+    figures,
+    ingest,
+    maps,
+    morphometrics,
+    panel,
+    ranking,
+    synthetic,
+    trend_models,
+    trends,
+)
+
+SOURCE_CSV = "AllCounts_V_4_1.csv"
+SIZE_CSV = "cleaned_penguins.csv"
+
+
+def scaled_allcounts(scale, path):
+    """Write a synthetic AllCounts file with ``scale`` times the real rows."""
+    source = pd.read_csv(SOURCE_CSV)
+    model = synthetic.fit_model(source)
+    return synthetic.write(model, scale * len(source), path)
+
+
+# Cases: setup(csv_path) builds whatever the timed step needs (not measured),
+# run(state) is the measured step.
+
+
+def _cold_cache(csv_path):
+    # A fresh cache directory each time, so there is no release to diff
+    # against and the snapshot is built from scratch
+    cache_dir = ingest.CACHE_DIR
+    ingest.CACHE_DIR = tempfile.mkdtemp(dir=cache_dir)
+    try:
+        ingest.build_cache(csv_path)
+    finally:
+        ingest.CACHE_DIR = cache_dir
+    return csv_path
+
+
+def _release_pair(csv_path):
+    """Two releases to alternate between, about 1% of their counts apart.
+
+    The revised copy has the same file name in another directory, so both
+    map to one cache and every build is applied as a delta.  The cache is
+    private to this case, as it ends on whichever release was built last.
+    """
+    ingest.CACHE_DIR = tempfile.mkdtemp(dir=ingest.CACHE_DIR)
+    raw = ingest.read_csv(csv_path)
+    revised = np.random.default_rng(0).random(len(raw)) < 0.01
+    raw.loc[revised, "penguin_count"] += 1
+    revised_path = os.path.join(
+        tempfile.mkdtemp(dir=os.path.dirname(csv_path)), os.path.basename(csv_path)
+    )
+    raw.to_csv(revised_path, index=False)
+    ingest.build_cache(csv_path)
+    return itertools.cycle([revised_path, csv_path])
+
+
+def _warm(csv_path):
+    ingest.ensure_cache(csv_path)
+    return csv_path
+
+
+def _observations(csv_path):
+    return ingest.load_observations(csv_path)
+
+
+def _site_cube(csv_path):
+    return cube.build_cube(ingest.load_observations(csv_path))
+
+
+def _site_totals(csv_path):
+    return (
+        _site_cube(csv_path)
+        .by_site.reset_index()
+        .rename(columns={"sum": "total_count"})
+    )
+
+
+def _site_ranking(csv_path):
+    site_cube = ingest.load_cube(csv_path)
+    return ranking.build_ranking_index(
+        site_cube.by_site,
+        site_cube.by_site_species,
+        ingest.load_trend_tables(csv_path).by_site,
+        ingest.load_rankings(csv_path),
+    )
+
+
+def _top_n_sites(index):
+    return ranking.top_sites(index, 25), ranking.top_species(index, 25)
+
+
+def _next_release(csv_path):
+    """The cached release and a copy with about 1% of its counts revised."""
+    old = ingest.load_observations(csv_path)
+    reference_text = ingest.load_references(csv_path, raw=True)["raw"]
+    new = old.copy()
+    revised = np.random.default_rng(0).random(len(new)) < 0.01
+    new.loc[revised, "penguin_count"] += 1
+    return old, reference_text, new, reference_text
+
+
+def _delta_state(csv_path):
+    old, old_references, new, new_references = _next_release(csv_path)
+    change = delta.diff_observations(old, old_references, new, new_references)
+    return delta.build_snapshot(old), new, change
+
+
+def _species_summaries(_):
+    return morphometrics.build_summaries(pd.read_csv(SIZE_CSV))
+
+
+def _species_figures(summaries):
+    for species, summary in summaries.items():
+        if summary is not None:
+            for chart in figures.SPECIES_CHARTS:
+                figures.species_figure(chart, species, summary).to_json()
+
+
+def _climate_merge(state):
+    store, population_panel = state
+    temp_data = (
+        climate.series(store, "Antarctica")
+        .astype("float64")
+        .rename("temperature")
+        .reset_index()
+    )
+    trends.linear_fit(temp_data["year"], temp_data["temperature"])
+    totals = population_panel.totals.reset_index()
+    merged = pd.merge(totals, temp_data, on="year", how="inner")
+    trends.linear_fit(merged["year"], merged["penguin_count"])
+    by_species = population_panel.by_species
+    for species in by_species.index.unique("common_name"):
+        species_data = by_species.loc[species].reset_index()
+        species_data = species_data[species_data["year"].isin(temp_data["year"])]
+        trends.linear_fit(species_data["year"], species_data["penguin_count"])
+        window = temp_data[
+            temp_data["year"].between(*species_data["year"].iloc[[0, -1]])
+        ]
+        trends.linear_fit(window["year"], window["temperature"])
+
+
+def _population_panel(csv_path):
+    cells = ingest.load_cube(csv_path).cells
+    return cells, trend_models.build_trend_models(cells).by_site_species
+
+
+def _climate_matrix(_):
+    matrix = climate.build_climate_matrix(climate.load_climate_store())
+    # A comparison of ten series, as picked in the climate explorer
+    return matrix, matrix.series_info.index[:: len(matrix.series_info) // 10][:10]
+
+
+def _climate_correlations(csv_path):
+    cells, models = _population_panel(csv_path)
+    return (
+        panel.build_panel(cells, models),
+        ingest.load_cube(csv_path).sites,
+        climate.build_climate_matrix(climate.load_climate_store()),
+    )
+
+
+def _render_colony_map(site_totals):
+    maps.render_colony_map(site_totals, light=False)
+
+
+def _render_observation_map(df):
+    maps.render_observation_map(df, light=False)
+
+
+CASES = {
+    "load_data_cold": ("Introduction", lambda p: p, _cold_cache),
+    "load_data_incremental": (
+        "Introduction",
+        _release_pair,
+        lambda paths: ingest.build_cache(next(paths)),
+    ),
+    "load_data_warm": ("Introduction", _warm, ingest.load_observations),
+    "site_cube": ("Introduction", _observations, cube.build_cube),
+    "delta_diff": (
+        "Introduction",
+        _next_release,
+        lambda state: delta.diff_observations(*state),
+    ),
+    "delta_update": (
+        "Introduction",
+        _delta_state,
+        lambda state: delta.update_snapshot(*state),
+    ),
+    "species_summaries": (
+        "Species Overview",
+        lambda p: pd.read_csv(SIZE_CSV),
+        morphometrics.build_summaries,
+    ),
+    "species_figures": ("Species Overview", _species_summaries, _species_figures),
+    "derived_metrics": ("Site Analysis", _observations, derived.build_derived_metrics),
+    "trend_tables": ("Site Analysis", _observations, trends.build_trend_tables),
+    "trend_models": (
+        "Site Analysis",
+        lambda p: ingest.load_cube(p).cells,
+        trend_models.build_trend_models,
+    ),
+    "site_ranking": ("Site Analysis", _warm, _site_ranking),
+    "top_n_sites": ("Site Analysis", _site_ranking, _top_n_sites),
+    "colony_map": ("Site Analysis", _site_totals, _render_colony_map),
+    "observation_map": ("Site Analysis", _observations, _render_observation_map),
+    "climate_store": (
+        "Climate Impact",
+        lambda p: None,
+        lambda _: climate.load_climate_store(),
+    ),
+    "population_panel": (
+        "Climate Impact",
+        _population_panel,
+        lambda state: panel.build_panel(*state),
+    ),
+    "climate_merge": (
+        "Climate Impact",
+        lambda p: (
+            climate.load_climate_store(),
+            panel.build_panel(*_population_panel(p)),
+        ),
+        _climate_merge,
+    ),
+    "climate_explorer": (
+        "Climate Impact",
+        _climate_matrix,
+        lambda state: climate.select(*state),
+    ),
+    "climate_correlations": (
+        "Climate Impact",
+        _climate_correlations,
+        lambda state: correlations.build_correlations(*state),
+    ),
+}
+
+
+def _max_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(case, csv_path, repeats):
+    """Run one case in this process and return its measurements."""
+    section, setup, run = CASES[case]
+    state = setup(csv_path)
+
+    baseline_rss = _max_rss_mb()
+    wall_ms = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run(state)
+        wall_ms.append((time.perf_counter() - started) * 1000)
+    peak_rss = _max_rss_mb()
+
+    # A separate traced pass, since tracemalloc itself slows the run down
+    tracemalloc.start()
+    blocks_before = sys.getallocatedblocks()
+    run(state)
+    blocks_after = sys.getallocatedblocks()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    return {
+        "case": case,
+        "section": section,
+        "wall_ms_min": min(wall_ms),
+        "wall_ms_median": statistics.median(wall_ms),
+        "repeats": repeats,
+        "peak_rss_mb": peak_rss,
+        "peak_rss_delta_mb": peak_rss - baseline_rss,
+        "traced_peak_mb": traced_peak / (1 << 20),
+        "live_blocks": sum(stat.count for stat in snapshot.statistics("filename")),
+        "allocated_blocks_delta": blocks_after - blocks_before,
+    }
+
+
+def _measure_in_child(args):
+    case, csv_path, cache_dir, repeats = args
+    ingest.CACHE_DIR = cache_dir
+    return measure(case, csv_path, repeats)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scales, cases, repeats):
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in scales:
+            csv_path = scaled_allcounts(
+                scale, os.path.join(workdir, f"AllCounts_x{scale}.csv")
+            )
+            cache_dir = os.path.join(workdir, "cache")
+            ingest.CACHE_DIR = cache_dir
+            rows = ingest.ensure_cache(csv_path)["rows"]
+            for case in cases:
+                # One process per measurement, so RSS peaks do not carry over
+                with context.Pool(1) as pool:
+                    result = pool.apply(
+                        _measure_in_child, ((case, csv_path, cache_dir, repeats),)
+                    )
+                result.update(scale=scale, rows=rows)
+                results.append(result)
+                print(
+                    f"{case:>20} x{scale:<4} {result['wall_ms_median']:10.1f} ms"
+                    f" {result['peak_rss_mb']:8.1f} MB",
+                    file=sys.stderr,
+                )
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+        },
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.scales, args.cases, args.repeats)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
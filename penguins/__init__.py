@@ -0,0 +1,5 @@
+"""Data layer for the Antarctic penguin data story.
+
+Everything in this package is plain pandas/NumPy so it can be used outside of
+Streamlit; ``app.py`` wraps the loaders in ``st.cache_data``.
+"""
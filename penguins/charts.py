@@ -0,0 +1,43 @@
+"""Chart-ready frames holding only what each chart encodes.
+
+Altair embeds a chart's data in the Vega-Lite spec sent to the browser, so
+every column and row handed to ``alt.Chart`` is serialised, shipped and
+parsed on each rerun.  These helpers aggregate on the server and keep just
+the encoded fields.
+"""
+
+from typing import NamedTuple
+
+import pandas as pd
+
+from penguins import trends
+
+COMPARISON_KEYS = ["site_name", "common_name"]
+
+
+class SiteComparison(NamedTuple):
+    points: pd.DataFrame  # yearly totals per (site, species)
+    trend_lines: pd.DataFrame  # first and last year of each fitted trend
+
+
+def site_comparison(comparison_data, by_site_species):
+    """Yearly totals and trend endpoints for the Site Comparison chart.
+
+    ``comparison_data`` is the survey slice for the selected sites and
+    ``by_site_species`` the precomputed trends of their yearly totals (see
+    :func:`trends.build_trend_tables`), so the browser draws two points per
+    trend instead of fitting a regression itself.
+    """
+    points = trends.yearly_totals(comparison_data, COMPARISON_KEYS)
+
+    series = pd.MultiIndex.from_frame(points[COMPARISON_KEYS].drop_duplicates())
+    fits = by_site_species.reindex(series).dropna(subset=["slope"])
+    ends = pd.concat(
+        [
+            fits.assign(year=fits["first_year"]),
+            fits.assign(year=fits["last_year"]),
+        ]
+    )
+    ends["penguin_count"] = trends.predict(ends, ends["year"])
+    trend_lines = ends.reset_index()[COMPARISON_KEYS + ["year", "penguin_count"]]
+    return SiteComparison(points=points, trend_lines=trend_lines)
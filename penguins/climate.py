@@ -0,0 +1,143 @@
+"""Indexed store for the IMF climate indicator CSV.
+
+The wide file (one row per country and indicator, one column per year) is
+parsed once into a long float32 series indexed by (ISO3, indicator, year),
+so looking up one country's series is an index slice rather than a filter
+and melt over the whole frame.  The store is kept in the shared Arrow cache
+(see :mod:`penguins.ingest`), so workers map it instead of reparsing.
+
+For comparing many series, :func:`build_climate_matrix` lays the store out
+as a dense (series x year) array over every year in the header, and
+:func:`select` picks rows from it by position, so charting N series costs N
+row copies whatever the size of the file.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from penguins import ingest
+
+CLIMATE_FILE = (
+    "Indicator_3_1_Climate_Indicators_Annual_Mean_Global_Surface_Temperature_"
+    "577579683071085080.csv"
+)
+
+SERIES_COLUMNS = ["ISO3", "Country", "Indicator", "Unit"]
+
+
+class ClimateStore(NamedTuple):
+    values: pd.Series
+    series_info: pd.DataFrame
+
+
+class ClimateMatrix(NamedTuple):
+    values: np.ndarray  # (series x year) float32, NaN where not reported
+    years: np.ndarray  # every year from the first to the last in the header
+    series_info: pd.DataFrame  # one row per series, in the order of ``values``
+
+
+def year_columns(columns):
+    """The year columns of the wide file, discovered from its header."""
+    return [column for column in columns if str(column).strip().isdigit()]
+
+
+def build_climate_store(raw):
+    """Turn the wide IMF frame into a :class:`ClimateStore`."""
+    years = year_columns(raw.columns)
+    series_info = raw[SERIES_COLUMNS].set_index(["ISO3", "Indicator"]).sort_index()
+
+    values = raw.set_index(["ISO3", "Indicator"])[years].astype("float32")
+    values.columns = pd.Index([int(year) for year in years], name="year")
+    values = values.stack(future_stack=True).dropna().rename("value")
+    return ClimateStore(values=values.sort_index(), series_info=series_info)
+
+
+def climate_frames(csv_path):
+    """Parse the wide CSV into the frames cached by :mod:`penguins.ingest`."""
+    # utf-8-sig drops the byte order mark in front of the first header
+    store = build_climate_store(pd.read_csv(csv_path, encoding="utf-8-sig"))
+    return {"values": store.values.to_frame(), "series_info": store.series_info}
+
+
+def climate_version(csv_path=CLIMATE_FILE):
+    return ingest.dataset_version(csv_path, climate_frames)
+
+
+def load_climate_store(csv_path=CLIMATE_FILE):
+    frames = ingest.load_frames(csv_path, climate_frames)
+    return ClimateStore(
+        values=frames["values"]["value"], series_info=frames["series_info"]
+    )
+
+
+def resolve_iso3(store, country):
+    """Accept either an ISO3 code or a country name as printed in the file."""
+    info = store.series_info
+    if country in info.index.get_level_values("ISO3"):
+        return country
+    matches = info.index.get_level_values("ISO3")[info["Country"] == country]
+    if len(matches) == 0:
+        raise KeyError(f"No climate series for {country!r}")
+    return matches[0]
+
+
+def series(store, country, indicator=None, years=None):
+    """Return one country's indicator values as a float32 series by year.
+
+    ``indicator`` may be omitted when the country has a single indicator, and
+    ``years`` optionally restricts the result to a ``(first, last)`` range.
+    """
+    iso3 = resolve_iso3(store, country)
+    if indicator is None:
+        indicator = store.series_info.loc[iso3].index[0]
+    values = store.values.loc[(iso3, indicator)]
+    if years is not None:
+        first, last = years
+        values = values.loc[first:last]
+    return values
+
+
+def build_climate_matrix(store):
+    """Lay out every series of a :class:`ClimateStore` as a dense matrix."""
+    index = store.values.index
+    years = index.get_level_values("year").to_numpy(dtype="int64")
+    all_years = np.arange(years.min(), years.max() + 1)
+    rows = store.series_info.index.get_indexer(index.droplevel("year"))
+    values = np.full((len(store.series_info), len(all_years)), np.nan, "float32")
+    values[rows, years - all_years[0]] = store.values.to_numpy()
+    return ClimateMatrix(values=values, years=all_years, series_info=store.series_info)
+
+
+def select(matrix, keys, years=None):
+    """The series ``keys`` as columns of a frame indexed by year.
+
+    ``keys`` are ISO3 codes, or (ISO3, indicator) pairs where a country has
+    several indicators; columns are labelled with the country names.
+    ``years`` optionally restricts the rows to a ``(first, last)`` range.
+    """
+    index = matrix.series_info.index
+    positions = []
+    for key in keys:
+        try:
+            at = index.get_loc(key)
+        except KeyError:
+            raise KeyError(f"No climate series {key!r}") from None
+        # An ISO3 code alone matches all of its indicators; take the first
+        positions.append(at.start if isinstance(at, slice) else at)
+
+    columns = slice(None)
+    if years is not None:
+        first_year, last_year = years
+        columns = slice(
+            max(first_year - matrix.years[0], 0),
+            max(last_year - matrix.years[0] + 1, 0),
+        )
+    return pd.DataFrame(
+        matrix.values[positions, columns].T,
+        index=pd.Index(matrix.years[columns], name="year"),
+        columns=pd.Index(
+            matrix.series_info["Country"].to_numpy()[positions], name="Country"
+        ),
+    )
@@ -0,0 +1,163 @@
+"""Append-only comment store backed by SQLite in WAL mode.
+
+Each comment is a single INSERT, so several Streamlit sessions can post at
+once without rewriting a shared file.  Reads page through the integer
+primary key: a ``before_id`` cursor pages back from a feed's oldest
+comment and an ``after_id`` cursor pages forward from its newest, so no
+read is larger than a page.  Comments from the legacy
+``penguin_comments.csv`` are imported once, the first time the database is
+opened.
+"""
+
+import html
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+COMMENTS_DB = os.environ.get("PENGUIN_COMMENTS_DB", "penguin_comments.db")
+LEGACY_CSV = "penguin_comments.csv"
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+FEED_CSS = """
+<style>
+.comment-feed .comment {
+    background-color: rgba(28, 131, 225, 0.1);
+    border-radius: 0.5rem;
+    padding: 0.75rem 1rem;
+    margin-bottom: 0.75rem;
+}
+.comment-feed .comment-meta {
+    font-family: monospace;
+    font-size: 0.85em;
+    opacity: 0.8;
+    margin-bottom: 0.25rem;
+}
+</style>
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    name TEXT NOT NULL,
+    comment TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def connect(db_path=COMMENTS_DB):
+    # Autocommit mode; writes that need a transaction open one explicitly
+    conn = sqlite3.connect(db_path, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def migrate_csv(conn, csv_path=LEGACY_CSV):
+    """Import the legacy CSV once; returns the number of comments imported."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        done = conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_csv'").fetchone()
+        imported = 0
+        if not done and os.path.exists(csv_path):
+            legacy = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+            rows = legacy[["Timestamp", "Name", "Comment"]].itertuples(index=False)
+            conn.executemany(
+                "INSERT INTO comments (timestamp, name, comment) VALUES (?, ?, ?)",
+                rows,
+            )
+            imported = len(legacy)
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_csv', ?)",
+            (str(imported),),
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return imported
+
+
+def init_store(db_path=COMMENTS_DB, legacy_csv=LEGACY_CSV):
+    """Create the schema and import the legacy CSV if that has not happened."""
+    with closing(connect(db_path)) as conn:
+        conn.executescript(SCHEMA)
+        migrate_csv(conn, legacy_csv)
+
+
+def add_comment(name, comment, db_path=COMMENTS_DB, timestamp=None):
+    """Append one comment and return its id."""
+    timestamp = timestamp or datetime.now().strftime(TIMESTAMP_FORMAT)
+    with closing(connect(db_path)) as conn:
+        cursor = conn.execute(
+            "INSERT INTO comments (timestamp, name, comment) VALUES (?, ?, ?)",
+            (timestamp, name if name else "Anonymous", comment),
+        )
+        return cursor.lastrowid
+
+
+def recent_comments(limit=None, before_id=None, after_id=None, db_path=COMMENTS_DB):
+    """Return comments newest-first as dicts, optionally older than ``before_id``.
+
+    Pass the smallest id of one page as ``before_id`` to fetch the next, or
+    the largest id shown as ``after_id`` to fetch newer comments.  With
+    ``after_id`` and a ``limit`` the rows are the ones just after it, so
+    paging forward leaves no gap.
+    """
+    query = "SELECT id, timestamp, name, comment FROM comments"
+    conditions, params = [], []
+    if before_id is not None:
+        conditions.append("id < ?")
+        params.append(before_id)
+    if after_id is not None:
+        conditions.append("id > ?")
+        params.append(after_id)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    forward = after_id is not None
+    query += " ORDER BY id ASC" if forward else " ORDER BY id DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    with closing(connect(db_path)) as conn:
+        rows = [dict(row) for row in conn.execute(query, params)]
+    return rows[::-1] if forward else rows
+
+
+def comment_page(limit, before_id=None, after_id=None, db_path=COMMENTS_DB):
+    """Return up to ``limit`` comments newest-first and whether more lie beyond.
+
+    A page runs back from ``before_id`` (or the newest comment), and "more"
+    means older comments exist; with ``after_id`` it runs forward from that
+    id, and "more" means newer comments exist.
+    """
+    rows = recent_comments(limit + 1, before_id, after_id, db_path=db_path)
+    more = len(rows) > limit
+    if after_id is not None:
+        return (rows[1:] if more else rows), more
+    return rows[:limit], more
+
+
+def comment_html(row):
+    """Render one comment for :func:`feed_html`."""
+    return (
+        '<div class="comment">'
+        f'<div class="comment-meta">{html.escape(row["timestamp"])} - '
+        f'{html.escape(row["name"])}:</div>'
+        f'<div>{html.escape(row["comment"]).replace(chr(10), "<br>")}</div>'
+        "</div>"
+    )
+
+
+def feed_html(items):
+    """Join rendered comments into one HTML block (a single Streamlit element)."""
+    return f'{FEED_CSS}<div class="comment-feed">{"".join(items)}</div>'
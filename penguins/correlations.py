@@ -0,0 +1,233 @@
+"""Lagged and rolling correlations between penguin and climate series.
+
+The population series are the imputed yearly totals of the panel (see
+:mod:`penguins.panel`) per (species, CCAMLR region), and the climate series
+are every (ISO3, indicator) row of the IMF file, taken from its dense
+matrix (see :func:`climate.build_climate_matrix`).  Both are laid out as
+(series x year) matrices over the climate years, and every pair is
+correlated at once with masked matrix products, so years missing from
+either series drop out of that pair only.
+
+Two trending series correlate strongly whatever their relation, so series
+are compared by their year-on-year changes: the change in ``log1p`` of the
+population, over the colonies imputed in both years, against the change in
+the climate indicator ``lag`` years earlier.  Rolling correlations over
+:data:`WINDOW` years use each pair's best lag.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from penguins import panel
+
+REGION_KEYS = ["common_name", "cammlr_region"]
+
+# Climate changes this many years before a population change are compared
+MAX_LAG = 10
+
+# Years in each rolling correlation
+WINDOW = 15
+
+# Fewer overlapping years than this leave a correlation NaN
+MIN_YEARS = 10
+
+RANKING_COLUMNS = [
+    "common_name",
+    "cammlr_region",
+    "lag",
+    "correlation",
+    "years",
+    "observed_share",
+]
+
+
+class ClimateCorrelations(NamedTuple):
+    populations: pd.DataFrame  # per (species, region): observed_share
+    climates: pd.DataFrame  # per (ISO3, indicator): Country, Unit
+    lagged: np.ndarray  # (population, climate, lag) correlations
+    counts: np.ndarray  # (population, climate, lag) years compared
+    best_lag: np.ndarray  # (population, climate) lag of the largest |r|
+    window_ends: np.ndarray  # last year of each rolling window
+    rolling: np.ndarray  # (population, climate, window) at the best lag
+
+
+def _correlate(x, z):
+    """Pearson correlation of every row of ``x`` with every row of ``z``.
+
+    Both are (series x year) with NaN for missing years; each pair uses the
+    years present in both.  Returns the correlations and the year counts.
+    """
+    mx, mz = np.isfinite(x), np.isfinite(z)
+    x, z = np.where(mx, x, 0.0), np.where(mz, z, 0.0)
+    mx, mz = mx.astype("float64"), mz.astype("float64")
+    n = mx @ mz.T
+    sx, sz = x @ mz.T, mx @ z.T
+    sxx, szz = (x * x) @ mz.T, mx @ (z * z).T
+    sxz = x @ z.T
+    return _pearson(n, sx, sz, sxx, szz, sxz), n
+
+
+def _pearson(n, sx, sz, sxx, szz, sxz):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = (n * sxz - sx * sz) / np.sqrt((n * sxx - sx**2) * (n * szz - sz**2))
+    return np.where(n >= MIN_YEARS, np.clip(r, -1, 1), np.nan)
+
+
+def population_growth(values, sites, years):
+    """Yearly change in ``log1p`` of each (species, region) total.
+
+    ``values`` is :attr:`panel.Panel.values` and ``sites`` the cube's site
+    attributes.  Each change only sums the colonies the panel has in both
+    years, so a colony entering or leaving the panel's horizon does not read
+    as a change, and both years' totals must have something counted.
+    Returns a (series x year) matrix over ``years[1:]`` and a frame of the
+    series with the mean share of their totals that was counted.
+    """
+    regions = sites["cammlr_region"].reindex(values.index.get_level_values("site_name"))
+    regional = values.set_index(
+        pd.Index(regions.to_numpy(), name="cammlr_region"), append=True
+    )
+    totals = panel.panel_totals(regional, REGION_KEYS)
+    populations = totals["observed_share"].groupby(level=REGION_KEYS).mean().to_frame()
+
+    # Each row's count the year before, for the same colony
+    index = values.index
+    site, species = index.codes[0], index.codes[1]
+    year = index.get_level_values("year").to_numpy()
+    count = values["penguin_count"].to_numpy(dtype="float64")
+    follows = np.zeros(len(values), dtype=bool)
+    follows[1:] = (
+        (site[1:] == site[:-1])
+        & (species[1:] == species[:-1])
+        & (year[1:] == year[:-1] + 1)
+    )
+    paired = pd.DataFrame(
+        {"current": count[1:], "previous": count[:-1]},
+        index=regional.index[1:],
+    )[follows[1:]]
+    sums = paired.groupby(
+        [paired.index.get_level_values(key) for key in REGION_KEYS + ["year"]],
+        observed=True,
+    ).sum()
+    growth = np.log1p(sums["current"]) - np.log1p(sums["previous"])
+
+    counted = totals.index
+    previous = pd.MultiIndex.from_arrays(
+        [
+            counted.get_level_values("common_name"),
+            counted.get_level_values("cammlr_region"),
+            counted.get_level_values("year") + 1,
+        ]
+    )
+    growth = growth[growth.index.isin(counted) & growth.index.isin(previous)]
+    matrix = (
+        growth.unstack("year")
+        .reindex(index=populations.index, columns=years[1:])
+        .to_numpy(dtype="float64")
+    )
+    return matrix, populations
+
+
+def build_correlations(population_panel, sites, matrix):
+    """Correlate every (species, region) with every climate series.
+
+    ``matrix`` is the :class:`climate.ClimateMatrix` of the climate file.
+    """
+    climate = matrix.values.astype("float64")
+    climates, years = matrix.series_info, matrix.years
+    # Year-on-year changes, at the later year of each pair
+    growth, populations = population_growth(population_panel.values, sites, years)
+    warming = np.diff(climate, axis=1)
+    n_years = growth.shape[1]
+
+    shape = (len(populations), len(climates), MAX_LAG + 1)
+    lagged, counts = np.full(shape, np.nan), np.zeros(shape)
+    for lag in range(min(MAX_LAG, n_years - 1) + 1):
+        lagged[..., lag], counts[..., lag] = _correlate(
+            growth[:, lag:], warming[:, : n_years - lag]
+        )
+    best_lag = np.argmax(np.where(np.isnan(lagged), -1, np.abs(lagged)), axis=2)
+
+    # Each pair's climate changes shifted by its best lag, then windowed sums
+    source = np.arange(n_years) - best_lag[..., None]
+    shifted = np.where(
+        source >= 0,
+        warming[np.arange(len(climates))[None, :, None], np.maximum(source, 0)],
+        np.nan,
+    )
+    x = np.broadcast_to(growth[:, None, :], shifted.shape)
+    present = np.isfinite(x) & np.isfinite(shifted)
+    x, z = np.where(present, x, 0.0), np.where(present, shifted, 0.0)
+    sums = [
+        _window_sums(term)
+        for term in (present.astype("float64"), x, z, x * x, z * z, x * z)
+    ]
+    return ClimateCorrelations(
+        populations=populations,
+        climates=climates,
+        lagged=lagged,
+        counts=counts,
+        best_lag=best_lag,
+        window_ends=years[WINDOW:],
+        rolling=_pearson(*sums),
+    )
+
+
+def _window_sums(values):
+    """Sums over every run of :data:`WINDOW` years along the last axis."""
+    total = np.cumsum(values, axis=-1)
+    return total[..., WINDOW - 1 :] - np.concatenate(
+        [np.zeros(values.shape[:-1] + (1,)), total[..., :-WINDOW]], axis=-1
+    )
+
+
+def _climate_position(correlations, iso3, indicator=None):
+    index = correlations.climates.index
+    matches = np.flatnonzero(index.get_level_values("ISO3") == iso3)
+    if indicator is not None:
+        matches = matches[index.get_level_values("Indicator")[matches] == indicator]
+    if len(matches) == 0:
+        raise KeyError(f"No climate series {iso3!r}")
+    return matches[0]
+
+
+def region_ranking(correlations, iso3, indicator=None):
+    """Every (species, region) against one climate series, strongest first.
+
+    Each row holds the best lag, the correlation at that lag and the years
+    it compares.  Pairs without enough overlapping years come last.
+    """
+    column = _climate_position(correlations, iso3, indicator)
+    lag = correlations.best_lag[:, column]
+    rows = np.arange(len(lag))
+    ranking = correlations.populations.reset_index().assign(
+        lag=lag,
+        correlation=correlations.lagged[rows, column, lag],
+        years=correlations.counts[rows, column, lag].astype("int64"),
+    )
+    order = np.argsort(-ranking["correlation"].abs().fillna(-1), kind="stable")
+    return ranking.iloc[order][RANKING_COLUMNS].reset_index(drop=True)
+
+
+def lag_profile(correlations, species, region, iso3, indicator=None):
+    """Correlation at each lag for one (species, region) and climate series."""
+    row = correlations.populations.index.get_loc((species, region))
+    column = _climate_position(correlations, iso3, indicator)
+    return pd.Series(
+        correlations.lagged[row, column],
+        index=pd.RangeIndex(MAX_LAG + 1, name="lag"),
+        name="correlation",
+    )
+
+
+def rolling_profile(correlations, species, region, iso3, indicator=None):
+    """Rolling correlation at the pair's best lag, by last year of window."""
+    row = correlations.populations.index.get_loc((species, region))
+    column = _climate_position(correlations, iso3, indicator)
+    return pd.Series(
+        correlations.rolling[row, column],
+        index=pd.Index(correlations.window_ends, name="year"),
+        name="correlation",
+    )
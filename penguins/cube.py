@@ -0,0 +1,109 @@
+"""Pre-aggregated (site, species, year) cube with its common roll-ups.
+
+The raw counts are grouped once into cells holding count/sum/min/max/mean/std.
+Coarser views are rolled up from the cells by combining those moments (no
+second pass over the raw rows), and every section reads its charts from the
+materialized roll-ups instead of running its own groupby.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+CELL_KEYS = ["site_name", "common_name", "year"]
+STAT_COLUMNS = ["count", "sum", "min", "max", "mean", "std"]
+SITE_COLUMNS = [
+    "site_id",
+    "cammlr_region",
+    "latitude_epsg_4326",
+    "longitude_epsg_4326",
+]
+
+
+class SiteCube(NamedTuple):
+    cells: pd.DataFrame
+    sites: pd.DataFrame
+    by_site: pd.DataFrame
+    by_species: pd.DataFrame
+    by_year: pd.DataFrame
+    by_region: pd.DataFrame
+    by_site_species: pd.DataFrame
+    by_species_year: pd.DataFrame
+
+
+def aggregate(df, keys):
+    """Group raw observations into count/sum/min/max/mean/std cells."""
+    counts = df["penguin_count"].astype("float64")
+    grouped = counts.groupby([df[key] for key in keys], observed=True, sort=True)
+    cells = grouped.agg(["count", "sum", "min", "max", "mean", "std"])
+    cells["sum"] = cells["sum"].astype("int64")
+    return cells[STAT_COLUMNS]
+
+
+def rollup(cells, keys):
+    """Combine cells into coarser groups, merging means and variances exactly."""
+    frame = cells.reset_index()
+    frame["m2"] = frame["std"].fillna(0.0) ** 2 * (frame["count"] - 1).clip(lower=0)
+    grouped = frame.groupby(keys, observed=True, sort=True)
+
+    out = grouped.agg(
+        count=("count", "sum"),
+        sum=("sum", "sum"),
+        min=("min", "min"),
+        max=("max", "max"),
+        m2=("m2", "sum"),
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["mean"] = out["sum"] / out["count"].where(out["count"] > 0)
+        group_mean = grouped["sum"].transform("sum") / grouped["count"].transform("sum")
+        between = (frame["count"] * (frame["mean"] - group_mean) ** 2).fillna(0.0)
+        out["m2"] += between.groupby([frame[key] for key in keys], observed=True).sum()
+        out["std"] = np.sqrt(out["m2"] / (out["count"] - 1).where(out["count"] > 1))
+    return out[STAT_COLUMNS]
+
+
+def site_attributes(df):
+    """Location and region of each site, from its first non-null values."""
+    return (
+        df.groupby("site_name", observed=True, sort=True)[SITE_COLUMNS]
+        .first()
+        .astype({"site_id": "object", "cammlr_region": "object"})
+    )
+
+
+def site_rollups(cells, sites):
+    """The per-site and per-(site, species) roll-ups of the sites in ``cells``."""
+    by_site = rollup(cells, ["site_name"])
+    by_site["species_richness"] = (
+        cells.reset_index().groupby("site_name", observed=True)["common_name"].nunique()
+    )
+    by_site = by_site.join(sites)
+
+    by_site_species = rollup(cells, ["site_name", "common_name"])
+    by_site_species = by_site_species.join(sites, on="site_name")
+    by_site_species["site_total"] = (
+        by_site["sum"]
+        .reindex(by_site_species.index.get_level_values("site_name"))
+        .to_numpy()
+    )
+    return by_site, by_site_species
+
+
+def build_cube(df):
+    """Aggregate ``df`` into the cube and materialize every roll-up."""
+    cells = aggregate(df, CELL_KEYS)
+    sites = site_attributes(df)
+    by_site, by_site_species = site_rollups(cells, sites)
+
+    regional_cells = cells.join(sites["cammlr_region"], on="site_name")
+    return SiteCube(
+        cells=cells,
+        sites=sites,
+        by_site=by_site,
+        by_species=rollup(cells, ["common_name"]),
+        by_year=rollup(cells, ["year"]),
+        by_region=rollup(regional_cells, ["cammlr_region"]),
+        by_site_species=by_site_species,
+        by_species_year=rollup(cells, ["common_name", "year"]),
+    )
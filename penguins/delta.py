@@ -0,0 +1,381 @@
+"""Delta ingest: apply a new AllCounts release as a change set.
+
+Observations are keyed by (site_id, common_name, year, count_type).  A key
+can hold several rows (repeat surveys in one season), so keys are compared
+whole: a key is *inserted* or *deleted* when only one release has it, and
+*updated* when the multiset of its rows differs, which an order-independent
+sum of row hashes detects however either release orders its rows.  Diffing
+is one hashing pass over both releases.
+
+Only the rows of changed keys go downstream.  The cube cells they touch are
+re-aggregated, the roll-ups and trends of the affected sites, species, years
+and regions are merged again from the patched cube, and the site ranking is
+patched in place, so the update follows the size of the change rather than
+of the release.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from penguins import cube, trends
+
+KEY_COLUMNS = ["site_id", "common_name", "year", "count_type"]
+
+
+class Delta(NamedTuple):
+    inserted: pd.MultiIndex
+    updated: pd.MultiIndex
+    deleted: pd.MultiIndex
+    removed: pd.DataFrame  # old rows of updated and deleted keys
+    added: pd.DataFrame  # new rows of inserted and updated keys
+
+
+class Snapshot(NamedTuple):
+    cube: cube.SiteCube
+    trend_tables: trends.TrendTables
+    rankings: pd.Series  # site totals, largest first
+
+
+def _index(df, keys):
+    """A plain MultiIndex of ``keys``, comparable across releases.
+
+    Categorical columns are compared by value, since each release has its
+    own categories.
+    """
+    return pd.MultiIndex.from_arrays(
+        [
+            (
+                df[key].astype("object")
+                if isinstance(df[key].dtype, pd.CategoricalDtype)
+                else df[key]
+            )
+            for key in keys
+        ]
+    )
+
+
+def key_ids(df):
+    """A 64-bit id per row for its (site, species, year, count type) key.
+
+    Categoricals hash by value, so ids agree across releases.
+    """
+    return pd.util.hash_pandas_object(df[KEY_COLUMNS], index=False).to_numpy()
+
+
+def key_hashes(df, reference_text, ids=None):
+    """Order-independent content hash of each key's rows, by sorted key id.
+
+    ``reference_text`` maps ``reference_id`` to the raw citation, because ids
+    are assigned per release and only the text can be compared.
+    """
+    ids = key_ids(df) if ids is None else ids
+    rows = pd.util.hash_pandas_object(
+        df.drop(columns="reference_id"), index=False
+    ).to_numpy()
+    cited = pd.util.hash_array(
+        reference_text.reindex(df["reference_id"]).to_numpy(dtype="object")
+    )
+    # uint64 arithmetic wraps, which is what a hash combination wants
+    combined = rows * np.uint64(1_000_003) + cited
+
+    order = np.argsort(ids, kind="stable")
+    ids = ids[order]
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    return pd.Series(np.add.reduceat(combined[order], starts), index=ids[starts])
+
+
+def _keys(rows, ids):
+    return _index(rows[np.isin(key_ids(rows), ids)], KEY_COLUMNS).unique()
+
+
+def diff_observations(old, old_references, new, new_references):
+    """Compare two releases key by key and return the :class:`Delta`."""
+    old_ids = key_ids(old)
+    new_ids = key_ids(new)
+    old_hash = key_hashes(old, old_references, old_ids)
+    new_hash = key_hashes(new, new_references, new_ids)
+
+    common, old_at, new_at = np.intersect1d(
+        old_hash.index, new_hash.index, assume_unique=True, return_indices=True
+    )
+    updated = common[old_hash.to_numpy()[old_at] != new_hash.to_numpy()[new_at]]
+    inserted = np.setdiff1d(new_hash.index, common, assume_unique=True)
+    deleted = np.setdiff1d(old_hash.index, common, assume_unique=True)
+
+    removed = old[np.isin(old_ids, np.concatenate([updated, deleted]))]
+    added = new[np.isin(new_ids, np.concatenate([inserted, updated]))]
+    return Delta(
+        inserted=_keys(added, inserted),
+        updated=_keys(added, updated),
+        deleted=_keys(removed, deleted),
+        removed=removed,
+        added=added,
+    )
+
+
+def summary(delta):
+    """Counts of changed keys and rows, as recorded in the ingest manifest."""
+    return {
+        "inserted": len(delta.inserted),
+        "updated": len(delta.updated),
+        "deleted": len(delta.deleted),
+        "rows_removed": len(delta.removed),
+        "rows_added": len(delta.added),
+    }
+
+
+def site_rankings(by_site):
+    """Site totals ordered largest first (ties by site name)."""
+    return by_site["sum"].sort_values(ascending=False, kind="stable")
+
+
+def _plain(table):
+    """``table`` with object index levels, sorted by value.
+
+    Aggregates of each release carry that release's categories; plain levels
+    let old and fresh rows be spliced together and keep one sort order.
+    """
+    index = table.index
+    if isinstance(index, pd.MultiIndex):
+        index = index.set_levels(
+            [
+                (
+                    level.astype("object")
+                    if isinstance(level, pd.CategoricalIndex)
+                    else level
+                )
+                for level in index.levels
+            ]
+        )
+    elif isinstance(index, pd.CategoricalIndex):
+        index = index.astype("object")
+    return table.set_axis(index).sort_index()
+
+
+def build_snapshot(df):
+    """Build the cube, trend tables and rankings of a release from scratch."""
+    site_cube = cube.SiteCube._make(_plain(table) for table in cube.build_cube(df))
+    trend_tables = trends.TrendTables._make(
+        _plain(table) for table in trends.build_trend_tables(df)
+    )
+    return Snapshot(
+        cube=site_cube,
+        trend_tables=trend_tables,
+        rankings=site_rankings(site_cube.by_site),
+    )
+
+
+def _groups(index, keys):
+    """The distinct values of the ``keys`` levels of ``index``."""
+    other = [name for name in index.names if name not in keys]
+    return (index.droplevel(other) if other else index).unique()
+
+
+def _mask(index, keys, groups):
+    """Whether each entry of ``index`` falls in ``groups`` on its ``keys`` levels.
+
+    Each level is screened through its (short) list of level values; only
+    the survivors are matched against ``groups`` as tuples.
+    """
+    if not isinstance(index, pd.MultiIndex):
+        return index.isin(groups)
+    mask = np.ones(len(index), dtype=bool)
+    for key in keys:
+        position = index.names.index(key)
+        wanted = index.levels[position].isin(groups.get_level_values(key))
+        mask &= wanted[index.codes[position]]
+    if len(keys) > 1:
+        other = [name for name in index.names if name not in keys]
+        candidates = index[mask]
+        candidates = candidates.droplevel(other) if other else candidates
+        mask[mask] = candidates.isin(groups)
+    return mask
+
+
+def _within(frame, keys, groups):
+    """Rows of ``frame`` whose ``keys`` index levels fall in ``groups``."""
+    return frame[_mask(frame.index, keys, groups)]
+
+
+def _replace(table, keys, groups, fresh):
+    """Swap the rows of ``groups`` in ``table`` for ``fresh`` ones."""
+    kept = table[~_mask(table.index, keys, groups)]
+    return pd.concat([kept, _plain(fresh)]).sort_index()
+
+
+def update_cube(site_cube, observations, changed):
+    """Patch ``site_cube`` for the ``changed`` rows of the new ``observations``.
+
+    Cells and the per-site roll-ups are recomputed for the affected sites.
+    The coarser roll-ups are then merged from the finest patched view that
+    covers them, so none of them rescans the whole cube.
+    """
+    touched = _index(changed, cube.CELL_KEYS).unique().set_names(cube.CELL_KEYS)
+    affected_sites = _groups(touched, ["site_name"])
+    site_rows = observations[observations["site_name"].isin(affected_sites)]
+    rows = site_rows[_index(site_rows, cube.CELL_KEYS).isin(touched)]
+    # Cells whose rows were all deleted simply get no fresh replacement
+    cells = _replace(
+        site_cube.cells, cube.CELL_KEYS, touched, cube.aggregate(rows, cube.CELL_KEYS)
+    )
+
+    sites = _replace(
+        site_cube.sites,
+        ["site_name"],
+        affected_sites,
+        cube.site_attributes(site_rows),
+    )
+    fresh_by_site, fresh_by_site_species = cube.site_rollups(
+        _within(cells, ["site_name"], affected_sites), sites
+    )
+    by_site = _replace(site_cube.by_site, ["site_name"], affected_sites, fresh_by_site)
+    by_site_species = _replace(
+        site_cube.by_site_species,
+        ["site_name"],
+        affected_sites,
+        fresh_by_site_species,
+    )
+
+    # A site that moved region changes both its old and its new region
+    regions = pd.Index(
+        pd.concat(
+            [
+                site_cube.sites["cammlr_region"].reindex(affected_sites),
+                sites["cammlr_region"].reindex(affected_sites),
+            ]
+        )
+        .dropna()
+        .unique(),
+        name="cammlr_region",
+    )
+    species = _groups(touched, ["common_name"])
+    years = _groups(touched, ["year"])
+    species_years = _groups(touched, ["common_name", "year"])
+    by_species_year = _replace(
+        site_cube.by_species_year,
+        ["common_name", "year"],
+        species_years,
+        cube.rollup(
+            _within(cells, ["common_name", "year"], species_years),
+            ["common_name", "year"],
+        ),
+    )
+    return cube.SiteCube(
+        cells=cells,
+        sites=sites,
+        by_site=by_site,
+        by_species=_replace(
+            site_cube.by_species,
+            ["common_name"],
+            species,
+            cube.rollup(
+                _within(by_site_species, ["common_name"], species), ["common_name"]
+            ),
+        ),
+        by_year=_replace(
+            site_cube.by_year,
+            ["year"],
+            years,
+            cube.rollup(_within(by_species_year, ["year"], years), ["year"]),
+        ),
+        by_region=_replace(
+            site_cube.by_region,
+            ["cammlr_region"],
+            regions,
+            cube.rollup(
+                by_site[by_site["cammlr_region"].isin(regions)], ["cammlr_region"]
+            ),
+        ),
+        by_site_species=by_site_species,
+        by_species_year=by_species_year,
+    )
+
+
+def _refit(table, totals, keys, groups):
+    points = (
+        _within(totals, keys, groups)["sum"]
+        .groupby(level=keys + ["year"], observed=True)
+        .sum()
+        .astype("float64")
+        .rename("penguin_count")
+        .reset_index()
+    )
+    return _replace(table, keys, groups, trends.group_trends(points, keys))
+
+
+def update_trend_tables(trend_tables, site_cube, touched):
+    """Refit the trends of the groups that contain a ``touched`` cell.
+
+    A cell's sum is the yearly total of its (site, species), so the trend
+    points of any coarser group are sums of cells.
+    """
+    return trends.TrendTables(
+        by_site=_refit(
+            trend_tables.by_site,
+            site_cube.cells,
+            ["site_name"],
+            _groups(touched, ["site_name"]),
+        ),
+        by_site_species=_refit(
+            trend_tables.by_site_species,
+            site_cube.cells,
+            ["site_name", "common_name"],
+            _groups(touched, ["site_name", "common_name"]),
+        ),
+        by_species=_refit(
+            trend_tables.by_species,
+            site_cube.by_species_year,
+            ["common_name"],
+            _groups(touched, ["common_name"]),
+        ),
+    )
+
+
+def update_rankings(rankings, by_site, sites):
+    """Re-rank ``sites`` in an otherwise unchanged ranking.
+
+    The other sites keep their positions; each re-ranked site is inserted by
+    binary search, after larger totals and among equal ones by name.
+    """
+    kept = rankings.drop(sites, errors="ignore")
+    fresh = site_rankings(by_site.reindex(sites).dropna(subset=["sum"]).sort_index())
+
+    totals = -kept.to_numpy()
+    names = kept.index.to_numpy(dtype="object")
+    first = np.searchsorted(totals, -fresh.to_numpy(), side="left")
+    last = np.searchsorted(totals, -fresh.to_numpy(), side="right")
+    positions = [
+        start + np.searchsorted(names[start:stop], name)
+        for start, stop, name in zip(first, last, fresh.index)
+    ]
+    return pd.Series(
+        np.insert(kept.to_numpy(), positions, fresh.to_numpy()),
+        index=pd.Index(
+            np.insert(names, positions, fresh.index.to_numpy(dtype="object")),
+            name="site_name",
+        ),
+        name=rankings.name,
+    )
+
+
+def update_snapshot(snapshot, observations, delta):
+    """Apply ``delta`` to the snapshot of the previous release.
+
+    ``observations`` is the new release; only the rows of the cells the
+    delta touches are read from it.
+    """
+    changed = pd.concat([delta.removed, delta.added])
+    if changed.empty:
+        return snapshot
+
+    site_cube = update_cube(snapshot.cube, observations, changed)
+    touched = _index(changed, cube.CELL_KEYS).unique().set_names(cube.CELL_KEYS)
+    return Snapshot(
+        cube=site_cube,
+        trend_tables=update_trend_tables(snapshot.trend_tables, site_cube, touched),
+        rankings=update_rankings(
+            snapshot.rankings, site_cube.by_site, _groups(touched, ["site_name"])
+        ),
+    )
@@ -0,0 +1,42 @@
+"""Derived per-survey metrics computed once per dataset version.
+
+Consecutive surveys are compared within a (site, species, count type) series,
+so a nest count is never differenced against an adult count or a different
+species at the same site.  Repeat surveys within the same season have no gap
+and are left without an annual change.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+SERIES_KEYS = ["site_name", "common_name", "count_type"]
+
+
+class DerivedMetrics(NamedTuple):
+    table: pd.DataFrame
+    largest_change: pd.Series
+
+
+def build_derived_metrics(df):
+    """Return the inter-survey gap and annual change for every observation."""
+    table = df[SERIES_KEYS + ["year", "penguin_count"]].copy()
+    table["year"] = table["year"].astype("int32")
+    table = table.sort_values(SERIES_KEYS + ["year"], kind="stable")
+
+    series = table.groupby(SERIES_KEYS, observed=True, sort=False)
+    year_diff = series["year"].diff()
+    count_diff = series["penguin_count"].diff().astype("float64")
+
+    table["year_diff"] = year_diff.astype("Int32")
+    table["annual_change"] = (count_diff / year_diff.where(year_diff > 0)).astype(
+        "float64"
+    )
+
+    change = table["annual_change"].abs()
+    if change.notna().any():
+        largest = table.loc[change.idxmax()]
+    else:
+        largest = pd.Series(np.nan, index=table.columns)
+    return DerivedMetrics(table=table, largest_change=largest)
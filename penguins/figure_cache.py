@@ -0,0 +1,91 @@
+"""A size-bounded cache of serialised figures shared by every session.
+
+``st.cache_data`` keeps one entry per distinct argument set for as long as
+the process lives, and charts keyed by widget values (a slider position, a
+selection of sites) would accumulate without bound.  :class:`FigureCache`
+holds figure JSON under (chart id, arguments) and evicts the least recently
+used entries once their total size passes a cap.
+
+It is used as a caching decorator, like ``st.cache_data``, and can sit
+beneath :func:`timing.timed_load`.  The chart id is the function's qualified
+name, and the key is built from its arguments: the dataset version and the
+widget parameters.  As with Streamlit's caches, arguments whose name starts
+with an underscore are left out of the key; they carry data the chart is
+drawn from, which the other arguments already identify.
+"""
+
+import functools
+import inspect
+import threading
+from collections import OrderedDict
+
+
+class FigureCache:
+    """Least-recently-used figure JSON, at most ``max_bytes`` in total.
+
+    Sizes are counted in characters of JSON, which is ASCII but for the odd
+    label.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._specs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._specs)
+
+    def __call__(self, func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def cached(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            key = (func.__qualname__,) + tuple(
+                (name, value)
+                for name, value in arguments.arguments.items()
+                if not name.startswith("_")
+            )
+            spec = self.get(key)
+            if spec is None:
+                spec = func(*args, **kwargs)
+                self.put(key, spec)
+            return spec
+
+        return cached
+
+    def get(self, key):
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._specs.move_to_end(key)
+            return spec
+
+    def put(self, key, spec):
+        """Store ``spec`` (a JSON string) and evict beyond the size cap.
+
+        A spec larger than the whole cap is not stored.
+        """
+        if len(spec) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._specs.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._specs[key] = spec
+            self.size += len(spec)
+            while self.size > self.max_bytes:
+                _, evicted = self._specs.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._specs.clear()
+            self.size = 0
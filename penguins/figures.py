@@ -0,0 +1,96 @@
+"""Plotly figures serialised once and replayed from their JSON.
+
+Building a figure with plotly.express costs tens of milliseconds, most of
+it validating every property.  Charts are built and validated once, stored
+as JSON (see :mod:`penguins.figure_cache`), and turned back into a figure
+with :func:`from_json`, which skips a second validation.  Box plots are
+drawn from server-side statistics (:func:`box_figure`) rather than raw
+samples.
+"""
+
+import json
+
+import plotly.express as px
+import plotly.graph_objects as go
+
+# plotly.express's first colour, as the box plot used before
+BOX_COLOR = "#636efa"
+
+
+def from_json(spec):
+    """A figure from JSON written by ``Figure.to_json`` of a valid figure."""
+    return go.Figure(json.loads(spec), _validate=False)
+
+
+def box_figure(boxes, outliers, title):
+    """Box plot drawn from precomputed statistics.
+
+    ``boxes`` has :data:`morphometrics.BOX_COLUMNS` per measurement and
+    ``outliers`` the measurement and value of each plotted outlier (see
+    :func:`morphometrics.box_stats`).  The figure holds no raw samples, so its
+    size does not depend on how many were measured.
+    """
+    boxes = boxes.dropna()
+    figure = go.Figure(
+        go.Box(
+            x=boxes.index,
+            q1=boxes["q1"],
+            median=boxes["median"],
+            q3=boxes["q3"],
+            lowerfence=boxes["lowerfence"],
+            upperfence=boxes["upperfence"],
+            name="",
+            marker_color=BOX_COLOR,
+            showlegend=False,
+        )
+    )
+    figure.add_trace(
+        go.Scatter(
+            x=outliers["measurement"],
+            y=outliers["value"],
+            mode="markers",
+            name="",
+            marker=dict(color=BOX_COLOR, size=5),
+            hovertemplate="Attribute=%{x}<br>Measurement=%{y}<extra></extra>",
+            showlegend=False,
+        )
+    )
+    figure.update_layout(
+        title=title,
+        xaxis=dict(title="Attribute"),
+        yaxis=dict(title="Measurement"),
+    )
+    return figure
+
+
+SPECIES_CHARTS = ["sizes", "sexes", "islands", "correlation"]
+
+
+def species_figure(chart, species, summary):
+    """One of the :data:`SPECIES_CHARTS` for a :class:`SpeciesSummary`."""
+    if chart == "sizes":
+        return box_figure(
+            summary.boxes,
+            summary.outliers,
+            title=f"Size Distribution of {species} Penguins",
+        )
+    if chart == "sexes":
+        return px.pie(
+            values=summary.sexes.values,
+            names=summary.sexes.index,
+            title=f"Gender Distribution of {species} Penguins",
+        )
+    if chart == "islands":
+        return px.bar(
+            x=summary.islands.index,
+            y=summary.islands.values,
+            title=f"Distribution of {species} Penguins Across Islands",
+        )
+    if chart == "correlation":
+        return px.imshow(
+            summary.correlation,
+            text_auto=True,
+            aspect="auto",
+            title=f"Correlation Heatmap for {species} Penguins",
+        )
+    raise ValueError(f"unknown species chart {chart!r}")
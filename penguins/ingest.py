@@ -0,0 +1,503 @@
+"""Columnar ingest cache for the MAPPPD AllCounts CSV.
+
+The CSV is parsed once into a typed Arrow IPC file that later runs memory-map
+instead of reparsing.  The bulky ``reference`` column is interned: each
+observation keeps an integer ``reference_id`` and the distinct records are
+parsed into a separate side file that is only read when something asks for
+citations.
+
+Alongside the observations the cache keeps a snapshot of the site cube, the
+trend tables and the site ranking.  When the CSV is replaced by a new
+release, the two releases are diffed key by key (see :mod:`penguins.delta`)
+and only the changed observations are applied to the stored snapshot; the
+manifest records the size of that change.
+
+The cache is shared by every Streamlit worker on a host (point them at the
+same ``PENGUIN_CACHE_DIR``).  Each build writes a new release directory and
+then atomically swaps in the manifest that names it, so a worker always sees
+one complete release, and builds are serialized by a lock file so a fleet
+starting together parses the CSV once.  Workers memory-map the release, so
+numeric columns are views of the shared page cache rather than private
+copies.  Other CSVs (climate, penguin sizes) use the same cache through
+:func:`load_frames`.
+
+Build the cache ahead of time with::
+
+    python -m penguins.ingest ./AllCounts_V_4_1.csv
+"""
+
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+
+from penguins import cube, delta, references, trends
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialized across processes
+    fcntl = None
+
+CACHE_DIR = os.environ.get("PENGUIN_CACHE_DIR", ".cache")
+
+# Bump when the on-disk layout changes so stale caches are rebuilt
+SCHEMA_VERSION = 7
+
+OBSERVATIONS_FILE = "observations.arrow"
+REFERENCES_FILE = "references.arrow"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "build.lock"
+SNAPSHOT_DIR = "snapshot"
+
+CATEGORICAL_COLUMNS = [
+    "site_name",
+    "site_id",
+    "cammlr_region",
+    "common_name",
+    "count_type",
+    "vantage",
+]
+
+CSV_DTYPES = {
+    **{column: "category" for column in CATEGORICAL_COLUMNS},
+    "longitude_epsg_4326": "float64",
+    "latitude_epsg_4326": "float64",
+    "day": "float32",
+    "month": "float32",
+    "year": "int32",
+    "season_starting": "int32",
+    "penguin_count": "float64",
+    "accuracy": "float32",
+    "reference": "string",
+}
+
+# Site columns get 32-bit dictionary indices: MAPPPD-scale and synthetic
+# datasets have more than 32767 distinct sites
+WIDE_CATEGORICAL_COLUMNS = ["site_name", "site_id"]
+
+OBSERVATIONS_SCHEMA = pa.schema(
+    [
+        *[
+            (
+                column,
+                pa.dictionary(
+                    pa.int32() if column in WIDE_CATEGORICAL_COLUMNS else pa.int16(),
+                    pa.string(),
+                ),
+            )
+            for column in CATEGORICAL_COLUMNS
+        ],
+        ("longitude_epsg_4326", pa.float64()),
+        ("latitude_epsg_4326", pa.float64()),
+        ("day", pa.float32()),
+        ("month", pa.float32()),
+        ("year", pa.int32()),
+        ("season_starting", pa.int32()),
+        ("penguin_count", pa.float64()),
+        ("accuracy", pa.float32()),
+        ("reference_id", pa.int32()),
+    ]
+)
+
+
+def cache_dir_for(csv_path):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(CACHE_DIR, name)
+
+
+def release_dir(csv_path, manifest):
+    """Directory holding the files of the release ``manifest`` points at."""
+    return os.path.join(cache_dir_for(csv_path), manifest["release"])
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, write):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write_manifest(cache_dir, manifest):
+    def write(tmp_path):
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    _write_atomic(os.path.join(cache_dir, MANIFEST_FILE), write)
+
+
+@contextlib.contextmanager
+def _build_lock(cache_dir):
+    """Hold the host-wide lock on building ``cache_dir``.
+
+    Workers that find the cache stale at the same time queue here, and all
+    but the first find it fresh once they get the lock.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, LOCK_FILE), "w") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _new_release(cache_dir, version):
+    # A fresh directory per build: nothing reads it until the manifest that
+    # names it is swapped in
+    return tempfile.mkdtemp(prefix=f"{version}-", dir=cache_dir)
+
+
+def _publish(cache_dir, manifest, previous=None):
+    """Swap in ``manifest`` and drop releases older than ``previous``.
+
+    The previous release is kept, since a worker may have read the old
+    manifest and not yet mapped its files; older ones have no readers left
+    to start (files already mapped stay valid after they are unlinked).
+    """
+    _write_manifest(cache_dir, manifest)
+    keep = {manifest["release"], previous and previous.get("release")}
+    for entry in os.scandir(cache_dir):
+        if entry.is_dir() and entry.name not in keep:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _write_table(path, table):
+    def write(tmp_path):
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    _write_atomic(path, write)
+
+
+def _arrow_table(df, schema=None, preserve_index=False):
+    """``df`` as an Arrow table whose float columns read back zero-copy.
+
+    Arrow turns NaN into nulls by default, and a column with nulls has to be
+    copied on its way back to pandas.  Keeping NaN as a value lets every
+    worker's frame view the mapped file instead.
+    """
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=preserve_index)
+    for i, field in enumerate(table.schema):
+        if (
+            pa.types.is_floating(field.type)
+            and table.column(i).null_count
+            and field.name in df.columns
+        ):
+            values = df[field.name].to_numpy(dtype=field.type.to_pandas_dtype())
+            table = table.set_column(
+                i, field, pa.array(values, type=field.type, from_pandas=False)
+            )
+    return table
+
+
+def _read_table(path, columns=None):
+    # The returned table's buffers point into the mapping, so it stays open
+    # for as long as the table is alive
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return table.select(columns) if columns else table
+
+
+def _read_frame(path, columns=None):
+    # split_blocks keeps each column in its own block, so null-free numeric
+    # columns stay views of the mapping; those arrays are read-only
+    return _read_table(path, columns).to_pandas(split_blocks=True)
+
+
+def _snapshot_path(directory, part, name):
+    return os.path.join(directory, SNAPSHOT_DIR, f"{part}.{name}.arrow")
+
+
+def _write_snapshot(directory, snapshot):
+    os.makedirs(os.path.join(directory, SNAPSHOT_DIR), exist_ok=True)
+    tables = {
+        **{("cube", name): table for name, table in snapshot.cube._asdict().items()},
+        **{
+            ("trends", name): table
+            for name, table in snapshot.trend_tables._asdict().items()
+        },
+        ("rankings", "sum"): snapshot.rankings.to_frame(),
+    }
+    for (part, name), table in tables.items():
+        _write_table(
+            _snapshot_path(directory, part, name),
+            _arrow_table(table, preserve_index=True),
+        )
+
+
+def _read_frames(directory, part, names):
+    return [_read_frame(_snapshot_path(directory, part, name)) for name in names]
+
+
+def _read_snapshot(directory):
+    """The stored snapshot, or None if any part of it is missing."""
+    try:
+        return delta.Snapshot(
+            cube=cube.SiteCube(*_read_frames(directory, "cube", cube.SiteCube._fields)),
+            trend_tables=trends.TrendTables(
+                *_read_frames(directory, "trends", trends.TrendTables._fields)
+            ),
+            rankings=_read_frames(directory, "rankings", ["sum"])[0]["sum"],
+        )
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+def _observations_frame(table):
+    # penguin_count is stored as float64 with NaN for the missing counts (see
+    # _arrow_table), so every numeric column is a view of the mapped file
+    return table.to_pandas(split_blocks=True)
+
+
+def _previous_release(cache_dir, manifest):
+    """Observations, raw citations and snapshot of the cached release, if any."""
+    if manifest is None or manifest.get("schema") != SCHEMA_VERSION:
+        return None
+    directory = os.path.join(cache_dir, manifest["release"])
+    snapshot = _read_snapshot(directory)
+    if snapshot is None:
+        return None
+    try:
+        observations = _observations_frame(
+            _read_table(os.path.join(directory, OBSERVATIONS_FILE))
+        )
+        reference_text = _read_frame(
+            os.path.join(directory, REFERENCES_FILE), ["reference_id", "raw"]
+        ).set_index("reference_id")["raw"]
+    except (OSError, pa.ArrowInvalid):
+        return None
+    return observations, reference_text, snapshot
+
+
+def read_csv(csv_path):
+    """Parse the raw AllCounts CSV with the typed column layout."""
+    # penguin_count has a handful of missing counts, so it stays float64 with
+    # NaN: a nullable integer column would be copied out of every mapping
+    return pd.read_csv(csv_path, dtype=CSV_DTYPES)
+
+
+def _source_fields(csv_path, sha256):
+    stat = os.stat(csv_path)
+    return {
+        "schema": SCHEMA_VERSION,
+        "csv": os.path.abspath(csv_path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": sha256,
+        "version": sha256[:16],
+    }
+
+
+def _build_allcounts(csv_path, sha256=None):
+    cache_dir = cache_dir_for(csv_path)
+    sha256 = sha256 or file_sha256(csv_path)
+    source = _source_fields(csv_path, sha256)
+    previous_manifest = _read_manifest(cache_dir)
+    previous = _previous_release(cache_dir, previous_manifest)
+
+    raw = read_csv(csv_path)
+    reference_id, raw_records = references.intern_references(raw["reference"])
+    raw = raw.drop(columns=["reference"]).assign(reference_id=reference_id)
+    observations = _arrow_table(raw, schema=OBSERVATIONS_SCHEMA)
+    reference_table = references.build_reference_table(raw_records)
+    reference_table["raw"] = raw_records.to_numpy()
+
+    df = _observations_frame(observations)
+    if previous is None:
+        changes = None
+        snapshot = delta.build_snapshot(df)
+    else:
+        old_df, old_reference_text, old_snapshot = previous
+        change = delta.diff_observations(
+            old_df, old_reference_text, df, reference_table["raw"]
+        )
+        changes = delta.summary(change)
+        snapshot = delta.update_snapshot(old_snapshot, df, change)
+
+    directory = _new_release(cache_dir, source["version"])
+    _write_table(os.path.join(directory, OBSERVATIONS_FILE), observations)
+    _write_table(
+        os.path.join(directory, REFERENCES_FILE),
+        pa.Table.from_pandas(reference_table.reset_index(), preserve_index=False),
+    )
+    _write_snapshot(directory, snapshot)
+
+    manifest = {
+        **source,
+        "release": os.path.basename(directory),
+        "rows": observations.num_rows,
+        # Changed keys and rows against the previous release (None when the
+        # snapshot was built from scratch)
+        "delta": changes,
+    }
+    _publish(cache_dir, manifest, previous_manifest)
+    return manifest
+
+
+def _build_frames(csv_path, parse, sha256=None):
+    cache_dir = cache_dir_for(csv_path)
+    sha256 = sha256 or file_sha256(csv_path)
+    source = _source_fields(csv_path, sha256)
+    frames = parse(csv_path)
+
+    directory = _new_release(cache_dir, source["version"])
+    for name, frame in frames.items():
+        _write_table(
+            os.path.join(directory, f"{name}.arrow"),
+            _arrow_table(frame, preserve_index=True),
+        )
+
+    manifest = {
+        **source,
+        "release": os.path.basename(directory),
+        "frames": list(frames),
+    }
+    _publish(cache_dir, manifest, _read_manifest(cache_dir))
+    return manifest
+
+
+def _builder(parse):
+    if parse is None:
+        return _build_allcounts
+    return functools.partial(_build_frames, parse=parse)
+
+
+def build_cache(csv_path, sha256=None, parse=None):
+    """Convert ``csv_path`` into the Arrow cache and return the new manifest.
+
+    Without ``parse`` the file is read as an AllCounts release.  Any other
+    CSV is cached as the frames ``parse(csv_path)`` returns, by name.
+    """
+    with _build_lock(cache_dir_for(csv_path)):
+        return _builder(parse)(csv_path, sha256=sha256)
+
+
+def ensure_cache(csv_path, parse=None):
+    """Return the manifest for ``csv_path``, rebuilding the cache if stale.
+
+    An unchanged mtime and size is trusted without hashing.  When either has
+    moved the file is hashed, and the cache is only rebuilt if the content
+    actually differs (a ``touch`` or a fresh checkout just refreshes the
+    manifest).  ``parse`` is as for :func:`build_cache`.
+    """
+    cache_dir = cache_dir_for(csv_path)
+    manifest = _read_manifest(cache_dir)
+    stat = os.stat(csv_path)
+    if (
+        manifest is not None
+        and manifest.get("schema") == SCHEMA_VERSION
+        and manifest["mtime_ns"] == stat.st_mtime_ns
+        and manifest["size"] == stat.st_size
+    ):
+        return manifest
+
+    with _build_lock(cache_dir):
+        # Another worker may have rebuilt the cache while this one waited
+        manifest = _read_manifest(cache_dir)
+        build = _builder(parse)
+        if manifest is None or manifest.get("schema") != SCHEMA_VERSION:
+            return build(csv_path)
+        if (
+            manifest["mtime_ns"] == stat.st_mtime_ns
+            and manifest["size"] == stat.st_size
+        ):
+            return manifest
+
+        sha256 = file_sha256(csv_path)
+        if sha256 != manifest["sha256"]:
+            return build(csv_path, sha256=sha256)
+
+        manifest = {**manifest, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+        _write_manifest(cache_dir, manifest)
+        return manifest
+
+
+def dataset_version(csv_path, parse=None):
+    """Short content hash identifying the current release of ``csv_path``."""
+    return ensure_cache(csv_path, parse)["version"]
+
+
+def load_observations(csv_path):
+    """Load the observations (everything but ``reference``) from the cache."""
+    directory = release_dir(csv_path, ensure_cache(csv_path))
+    return _observations_frame(_read_table(os.path.join(directory, OBSERVATIONS_FILE)))
+
+
+def load_references(csv_path, raw=False):
+    """Load the parsed reference table, indexed by ``reference_id``.
+
+    The original escaped bibtex text is only included with ``raw=True``.
+    """
+    directory = release_dir(csv_path, ensure_cache(csv_path))
+    columns = ["reference_id", *references.FIELDS] + (["raw"] if raw else [])
+    return _read_frame(os.path.join(directory, REFERENCES_FILE), columns).set_index(
+        "reference_id"
+    )
+
+
+def load_cube(csv_path):
+    """Load the site cube of the current release from the snapshot."""
+    directory = release_dir(csv_path, ensure_cache(csv_path))
+    return cube.SiteCube(*_read_frames(directory, "cube", cube.SiteCube._fields))
+
+
+def load_trend_tables(csv_path):
+    """Load the trend tables of the current release from the snapshot."""
+    directory = release_dir(csv_path, ensure_cache(csv_path))
+    return trends.TrendTables(
+        *_read_frames(directory, "trends", trends.TrendTables._fields)
+    )
+
+
+def load_rankings(csv_path):
+    """Load the site totals of the current release, largest first."""
+    directory = release_dir(csv_path, ensure_cache(csv_path))
+    return _read_frames(directory, "rankings", ["sum"])[0]["sum"]
+
+
+def load_frames(csv_path, parse):
+    """Load the frames cached for ``csv_path`` by ``parse``, by name."""
+    manifest = ensure_cache(csv_path, parse)
+    directory = release_dir(csv_path, manifest)
+    return {
+        name: _read_frame(os.path.join(directory, f"{name}.arrow"))
+        for name in manifest["frames"]
+    }
+
+
+def single_frame(csv_path):
+    """``parse`` for a plain CSV cached as one frame (see :func:`load_frame`)."""
+    return {"frame": pd.read_csv(csv_path)}
+
+
+def load_frame(csv_path):
+    """Load a plain CSV through the cache as one read-only frame."""
+    return load_frames(csv_path, single_frame)["frame"]
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:] or ["./AllCounts_V_4_1.csv"]:
+        manifest = build_cache(path)
+        print(f"{path}: {manifest['rows']} rows, version {manifest['version']}")
+        if manifest["delta"] is not None:
+            print(f"  applied as a delta: {manifest['delta']}")
@@ -0,0 +1,268 @@
+"""Colony map rendering.
+
+The map is built from a single GeoJSON FeatureCollection (rather than one
+folium marker object per site) and rendered to a standalone HTML string, so
+the caller can cache the HTML per dataset version and tile choice.
+"""
+
+import base64
+import json
+
+import folium
+import numpy as np
+from folium.plugins import MarkerCluster
+
+MAP_WIDTH = 800
+MAP_HEIGHT = 600
+
+# Marker radii are rounded to this step; folium emits one style branch per
+# distinct style, so a coarse step keeps the generated script small
+RADIUS_STEP = 0.5
+
+LEGEND_HTML = """
+<div style="position: fixed; bottom: 50px; left: 50px; width: 120px; height: 90px;
+    border:2px solid grey; z-index:9999; font-size:14px;
+    background-color:rgba({shade}, {shade}, {shade}, 0.8);">
+    <p style="margin-top: 5px; margin-bottom: 5px; margin-left: 5px; color: {text};">
+    <strong>Legend</strong><br>
+    • Small Colony<br>
+    •• Medium Colony<br>
+    ••• Large Colony
+    </p>
+</div>
+"""
+
+
+def colony_features(site_totals):
+    """Build a GeoJSON FeatureCollection with one point per site.
+
+    ``site_totals`` needs ``site_name``, ``total_count`` and the EPSG:4326
+    coordinate columns.
+    """
+    epsilon = 1e-10  # avoid log(0) for sites with no counted birds
+    totals = site_totals["total_count"].to_numpy(dtype="float64")
+    radius = np.log(totals + epsilon) * 2
+    radius = np.round(np.clip(radius, 0, None) / RADIUS_STEP) * RADIUS_STEP
+
+    coordinates = np.column_stack(
+        [
+            site_totals["longitude_epsg_4326"].to_numpy(dtype="float64"),
+            site_totals["latitude_epsg_4326"].to_numpy(dtype="float64"),
+        ]
+    ).tolist()
+    names = site_totals["site_name"].astype(str).tolist()
+    labels = site_totals["total_count"].map("{:,}".format).tolist()
+
+    features = [
+        {
+            "type": "Feature",
+            "id": i,
+            "geometry": {"type": "Point", "coordinates": point},
+            "properties": {"site_name": name, "total_count": label, "radius": r},
+        }
+        for i, (point, name, label, r) in enumerate(
+            zip(coordinates, names, labels, radius.tolist())
+        )
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def build_colony_map(site_totals, light):
+    """Return the folium map of colony sites for the light or dark basemap."""
+    tile = "CartoDB positron" if light else "CartoDB dark_matter"
+    color = "blue" if light else "lightblue"
+
+    m = folium.Map(location=[-77, 0], zoom_start=3, tiles=tile)
+    marker_cluster = MarkerCluster()
+
+    folium.GeoJson(
+        colony_features(site_totals),
+        marker=folium.CircleMarker(
+            color=color,
+            fill=True,
+            fill_color=color,
+            fill_opacity=0.7,
+            weight=2,
+        ),
+        style_function=lambda feature: {"radius": feature["properties"]["radius"]},
+        popup=folium.GeoJsonPopup(
+            fields=["site_name", "total_count"],
+            aliases=["Site", "Total Penguin Count"],
+        ),
+    ).add_to(marker_cluster)
+    marker_cluster.add_to(m)
+
+    legend_html = LEGEND_HTML.format(
+        shade=255 if light else 0, text="black" if light else "white"
+    )
+    m.get_root().html.add_child(folium.Element(legend_html))
+    return m
+
+
+def render_colony_map(site_totals, light):
+    """Render the colony map to a standalone HTML document."""
+    figure = folium.Figure()
+    figure.add_child(build_colony_map(site_totals, light))
+    return figure.render()
+
+
+# deck.gl observation layer
+
+SPECIES_COLORS = [
+    [31, 119, 180],
+    [255, 127, 14],
+    [44, 160, 44],
+    [214, 39, 40],
+    [148, 103, 189],
+    [140, 86, 75],
+    [227, 119, 194],
+    [127, 127, 127],
+]
+
+OBSERVATION_SCRIPT = """
+<style>
+  #year-filter {{
+    position: fixed; top: 10px; left: 10px; z-index: 10; padding: 6px 10px;
+    font: 13px sans-serif; background: rgba(255, 255, 255, 0.85); border-radius: 4px;
+  }}
+</style>
+<div id="year-filter">
+  <label><input id="all-years" type="checkbox" checked> All years</label>
+  <input id="year" type="range" min="{first_year}" max="{last_year}"
+         value="{last_year}" step="1" disabled>
+  <span id="year-label">{first_year}&ndash;{last_year}</span>
+</div>
+<script>
+  (function () {{
+    function decode(b64, Type) {{
+      const bytes = Uint8Array.from(atob(b64), (c) => c.charCodeAt(0));
+      return new Type(bytes.buffer);
+    }}
+    const columns = {columns};
+    const species = {species};
+    const positions = decode(columns.positions, Float32Array);
+    const years = decode(columns.years, Float32Array);
+    const counts = decode(columns.counts, Float32Array);
+    const radii = decode(columns.radii, Float32Array);
+    const colors = decode(columns.colors, Uint8Array);
+    const codes = decode(columns.species, Uint8Array);
+
+    const data = {{
+      length: years.length,
+      attributes: {{
+        getPosition: {{ value: positions, size: 2 }},
+        getRadius: {{ value: radii, size: 1 }},
+        getFillColor: {{ value: colors, size: 4, normalized: true }},
+        getFilterValue: {{ value: years, size: 1 }},
+      }},
+    }};
+
+    function setRange(range) {{
+      deckInstance.setProps({{
+        layers: deckInstance.props.layers.map((layer) =>
+          layer.clone({{ data, filterRange: range }})
+        ),
+      }});
+    }}
+
+    const slider = document.getElementById("year");
+    const allYears = document.getElementById("all-years");
+    const label = document.getElementById("year-label");
+    function update() {{
+      slider.disabled = allYears.checked;
+      if (allYears.checked) {{
+        label.textContent = "{first_year}\\u2013{last_year}";
+        setRange([{first_year}, {last_year}]);
+      }} else {{
+        label.textContent = slider.value;
+        setRange([Number(slider.value), Number(slider.value)]);
+      }}
+    }}
+    slider.addEventListener("input", update);
+    allYears.addEventListener("change", update);
+
+    deckInstance.setProps({{
+      getTooltip: ({{ index }}) =>
+        index >= 0 && {{
+          text: `${{species[codes[index]]}}\\n${{years[index]}}: ${{counts[index].toLocaleString()}}`,
+        }},
+    }});
+    update();
+  }})();
+</script>
+"""
+
+
+def _b64(array):
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii")
+
+
+def observation_columns(df):
+    """Pack every observation into base64-encoded little-endian column buffers.
+
+    Returns the buffers plus the species names the ``species`` codes refer to.
+    Observations without a count are left out.
+    """
+    df = df[df["penguin_count"].notna()]
+    species = df["common_name"].astype("category")
+    codes = species.cat.codes.to_numpy(dtype="uint8")
+    counts = df["penguin_count"].to_numpy(dtype="float32")
+
+    palette = np.array(SPECIES_COLORS, dtype="uint8")[codes % len(SPECIES_COLORS)]
+    colors = np.column_stack([palette, np.full(len(codes), 180, dtype="uint8")])
+
+    positions = np.column_stack(
+        [
+            df["longitude_epsg_4326"].to_numpy(dtype="float32"),
+            df["latitude_epsg_4326"].to_numpy(dtype="float32"),
+        ]
+    )
+    radii = np.clip(np.log1p(counts), 1, None).astype("float32")
+
+    columns = {
+        "positions": _b64(positions.astype("<f4")),
+        "years": _b64(df["year"].to_numpy(dtype="<f4")),
+        "counts": _b64(counts.astype("<f4")),
+        "radii": _b64(radii.astype("<f4")),
+        "colors": _b64(colors),
+        "species": _b64(codes),
+    }
+    return columns, [str(name) for name in species.cat.categories]
+
+
+def render_observation_map(df, light):
+    """Render every observation as a deck.gl point layer with a year filter.
+
+    The observations travel as binary column buffers and the year slider
+    updates the layer's ``DataFilterExtension`` range in the browser, so
+    changing years never round-trips to Python.
+    """
+    import pydeck as pdk
+
+    columns, species = observation_columns(df)
+    first_year, last_year = int(df["year"].min()), int(df["year"].max())
+
+    layer = pdk.Layer(
+        "ScatterplotLayer",
+        data=[],
+        pickable=True,
+        opacity=0.8,
+        radius_units=pdk.types.String("pixels"),
+        radius_scale=1.5,
+        extensions=[{"@@type": "DataFilterExtension", "filterSize": 1}],
+        filter_range=[first_year, last_year],
+    )
+    deck = pdk.Deck(
+        layers=[layer],
+        initial_view_state=pdk.ViewState(latitude=-70, longitude=0, zoom=1.5),
+        map_provider="carto",
+        map_style=pdk.map_styles.CARTO_LIGHT if light else pdk.map_styles.CARTO_DARK,
+    )
+    html = deck.to_html(as_string=True)
+    script = OBSERVATION_SCRIPT.format(
+        columns=json.dumps(columns),
+        species=json.dumps(species),
+        first_year=first_year,
+        last_year=last_year,
+    )
+    return html.replace("</html>", f"{script}</html>")
@@ -0,0 +1,121 @@
+"""Per-species morphometrics summaries for the Species Overview.
+
+The size data is summarised once per dataset version, so switching species
+reads a prepared summary instead of filtering and aggregating the raw rows
+on every rerun.
+
+Box plots are summarised too: :func:`box_stats` computes the quartiles,
+whiskers and outliers of every (species, measurement) group in one grouped
+pass, so a box chart carries five numbers per box rather than every sample
+for the browser to sort.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+MEASUREMENTS = [
+    "culmen_length_mm",
+    "culmen_depth_mm",
+    "flipper_length_mm",
+    "body_mass_g",
+]
+
+SEX_LABELS = {0: "Unknown", 1: "Female", 2: "Male"}
+
+# Whiskers reach the furthest sample within this many IQRs of the box (Tukey)
+WHISKER_IQR = 1.5
+
+# Outliers kept per box, furthest from the median first, so a chart's size
+# does not grow with the number of samples
+MAX_OUTLIERS = 50
+
+BOX_COLUMNS = ["q1", "median", "q3", "lowerfence", "upperfence"]
+
+
+class SpeciesSummary(NamedTuple):
+    boxes: pd.DataFrame  # BOX_COLUMNS per measurement
+    outliers: pd.DataFrame  # measurement and value of the plotted outliers
+    means: pd.Series  # per measurement
+    sexes: pd.Series  # counts per sex label, largest first
+    islands: pd.Series  # counts per island, largest first
+    correlation: pd.DataFrame  # between the measurements
+
+
+def box_stats(values, keys):
+    """Box plot statistics of ``values["value"]`` per ``keys`` group.
+
+    Quartiles interpolate linearly between samples.  Returns the
+    :data:`BOX_COLUMNS` per group and the outliers beyond the whiskers, at
+    most :data:`MAX_OUTLIERS` per group.
+    """
+    grouped = values.groupby(keys, observed=True, sort=True)
+    codes = grouped.ngroup().to_numpy()
+    sample = values["value"].to_numpy(dtype="float64")
+
+    quartiles = grouped["value"].quantile([0.25, 0.5, 0.75]).unstack()
+    q1, median, q3 = (quartiles[q].to_numpy() for q in (0.25, 0.5, 0.75))
+    reach = WHISKER_IQR * (q3 - q1)
+    inside = (sample >= (q1 - reach)[codes]) & (sample <= (q3 + reach)[codes])
+
+    n_groups = len(quartiles)
+    lowerfence = np.full(n_groups, np.inf)
+    upperfence = np.full(n_groups, -np.inf)
+    np.minimum.at(lowerfence, codes[inside], sample[inside])
+    np.maximum.at(upperfence, codes[inside], sample[inside])
+    boxes = pd.DataFrame(
+        {
+            "q1": q1,
+            "median": median,
+            "q3": q3,
+            "lowerfence": lowerfence,
+            "upperfence": upperfence,
+        },
+        index=quartiles.index,
+    )
+
+    outliers = values[~inside].assign(distance=np.abs(sample - median[codes])[~inside])
+    outliers = (
+        outliers.sort_values("distance", ascending=False, kind="stable")
+        .groupby(keys, observed=True, sort=False)
+        .head(MAX_OUTLIERS)
+        .drop(columns="distance")
+    )
+    return boxes, outliers
+
+
+def build_summaries(size_df):
+    """Summarise every species in ``size_df``, in order of first appearance.
+
+    Species without any measurement map to None, as there is nothing to
+    chart for them.
+    """
+    measured = size_df.dropna(subset=MEASUREMENTS)
+    values = measured.melt(
+        id_vars="species",
+        value_vars=MEASUREMENTS,
+        var_name="measurement",
+        value_name="value",
+    )
+    boxes, outliers = box_stats(values, ["species", "measurement"])
+
+    summaries = {}
+    for species, rows in size_df.groupby("species", sort=False):
+        measurements = rows[MEASUREMENTS]
+        if not measurements.notnull().any().any():
+            summaries[species] = None
+            continue
+        summaries[species] = SpeciesSummary(
+            boxes=boxes.reindex(
+                pd.MultiIndex.from_product([[species], MEASUREMENTS])
+            ).droplevel(0),
+            outliers=outliers.loc[
+                outliers["species"] == species, ["measurement", "value"]
+            ].reset_index(drop=True),
+            means=measurements.mean(),
+            sexes=rows["sex"].map(SEX_LABELS).value_counts(),
+            islands=rows["island"].value_counts(),
+            correlation=measurements.corr(),
+        )
+    return summaries
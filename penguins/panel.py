@@ -0,0 +1,207 @@
+"""Dense (site, species, year) population panel with uncertainty bands.
+
+Survey years are irregular, so a plain sum of counts per year mostly tracks
+which sites happened to be visited.  The panel gives every (site, species)
+series a value in every year around its surveys instead:
+
+* surveyed years keep their count;
+* gaps between two surveys are interpolated linearly in ``log1p`` space;
+* up to :data:`MAX_EXTRAPOLATION` years before the first or after the last
+  survey follow the series' shrunk log-linear trend (see
+  :mod:`penguins.trend_models`).  Further out the series has no value.
+
+Uncertainty treats each series' ``log1p`` counts as a random walk whose
+per-year variance is estimated for each species from consecutive surveys:
+a gap gets the variance of a Brownian bridge between its two surveys, and
+an extrapolated year that of a walk away from the nearest survey.  Totals
+add the (log-normal) variances of their series, assuming independence, and
+are only reported for years in which at least one series was counted.
+
+Everything is computed for all series at once with ``searchsorted`` over
+sorted (series, year) keys.  Only each series' own range of years is laid
+out, never every series over the whole record.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Years before the first and after the last survey a series is extrapolated
+MAX_EXTRAPOLATION = 10
+
+# Two-sided 95% normal quantile
+Z_95 = 1.959964
+
+PANEL_COLUMNS = ["penguin_count", "lower", "upper", "variance", "source"]
+TOTAL_COLUMNS = ["penguin_count", "lower", "upper", "observed_share"]
+
+SOURCES = ["observed", "interpolated", "extrapolated"]
+
+
+class Panel(NamedTuple):
+    values: pd.DataFrame  # one row per (site, species, year) in the horizon
+    totals: pd.DataFrame  # per year
+    by_species: pd.DataFrame  # per (species, year)
+
+
+def _walk_variance(series, years, log_count, species, n_species):
+    """Per-year variance of ``log1p`` counts for each species code."""
+    same = series[1:] == series[:-1]
+    step = np.diff(years)[same]
+    change = np.diff(log_count)[same]
+    owner = species[1:][same]
+    # Mean squared change per year of gap, the random walk's MLE
+    weights = np.bincount(owner, weights=change**2, minlength=n_species)
+    span = np.bincount(owner, weights=step, minlength=n_species)
+    overall = (change**2).sum() / step.sum() if step.sum() > 0 else 0.0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = np.where(span > 0, weights / span, overall)
+    return variance
+
+
+def _series_ranges(series, years, n_series):
+    """(series, year) rows of each series' own range, in key order.
+
+    A range runs from :data:`MAX_EXTRAPOLATION` years before the series'
+    first survey to as many after its last, within the record's years.
+    """
+    first = np.searchsorted(series, np.arange(n_series))
+    last = np.searchsorted(series, np.arange(n_series), side="right") - 1
+    start = np.maximum(years[first] - MAX_EXTRAPOLATION, years.min())
+    stop = np.minimum(years[last] + MAX_EXTRAPOLATION, years.max())
+    length = stop - start + 1
+    dense_series = np.repeat(np.arange(n_series), length)
+    dense_years = start[dense_series] + np.arange(len(dense_series))
+    dense_years -= (np.cumsum(length) - length)[dense_series]
+    return dense_series, dense_years
+
+
+def _impute(series, years, log_count, walk, slope, dense_series, dense_years):
+    """``log1p`` estimate, its variance and source code of every range row.
+
+    ``walk`` and ``slope`` are per series.  The intermediates are as long as
+    the ranges, so they are freed before the panel frame is built.
+    """
+    # Sorted (series, year) keys, so searchsorted finds the surveys either side
+    base = years.min()
+    span = years.max() - base + 1
+    keys = series * span + (years - base)
+    dense_keys = dense_series * span + (dense_years - base)
+    after = np.searchsorted(keys, dense_keys, side="left")
+    before = after - 1
+    exact = (after < len(keys)) & (keys[np.minimum(after, len(keys) - 1)] == dense_keys)
+    has_next = (after < len(keys)) & (
+        series[np.minimum(after, len(keys) - 1)] == dense_series
+    )
+    has_prev = (before >= 0) & (series[np.maximum(before, 0)] == dense_series)
+    nxt = np.minimum(after, len(keys) - 1)
+    prv = np.maximum(before, 0)
+
+    walk = walk[dense_series]
+    to_prev = (dense_years - years[prv]).astype("float64")
+    to_next = (years[nxt] - dense_years).astype("float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share = to_prev / (to_prev + to_next)
+        between = (1 - share) * log_count[prv] + share * log_count[nxt]
+        bridge = walk * to_prev * to_next / (to_prev + to_next)
+    forward = log_count[prv] + slope[dense_series] * to_prev
+    backward = log_count[nxt] - slope[dense_series] * to_next
+
+    interpolated = ~exact & has_prev & has_next
+    log_estimate = np.select(
+        [exact, interpolated, has_prev], [log_count[nxt], between, forward], backward
+    )
+    log_variance = np.select(
+        [exact, interpolated, has_prev], [0.0, bridge, walk * to_prev], walk * to_next
+    )
+    source = np.select([exact, interpolated], [0, 1], 2).astype("int8")
+    return log_estimate, log_variance, source
+
+
+def build_panel(cells, site_species_models):
+    """Impute the dense panel from the cube cells.
+
+    ``site_species_models`` is :attr:`trend_models.TrendModels.by_site_species`,
+    whose shrunk slopes drive the extrapolation (series without one are held
+    level).
+    """
+    counted = cells[cells["count"] > 0]["sum"]
+    index = counted.index
+    pairs = index.droplevel("year")
+    series, series_index = pd.factorize(pairs, sort=True)
+    series_index = pd.MultiIndex.from_tuples(series_index, names=pairs.names)
+    years = index.get_level_values("year").to_numpy(dtype="int64")
+    log_count = np.log1p(counted.to_numpy(dtype="float64"))
+
+    order = np.lexsort((years, series))
+    series, years, log_count = series[order], years[order], log_count[order]
+    species_codes, species_names = pd.factorize(
+        series_index.get_level_values("common_name")
+    )
+    variance = _walk_variance(
+        series, years, log_count, species_codes[series], len(species_names)
+    )
+    slope = (
+        site_species_models["shrunk_slope"].reindex(series_index).fillna(0.0).to_numpy()
+    )
+
+    dense_series, dense_years = _series_ranges(series, years, len(series_index))
+    log_estimate, log_variance, source = _impute(
+        series,
+        years,
+        log_count,
+        variance[species_codes],
+        slope,
+        dense_series,
+        dense_years,
+    )
+
+    spread = Z_95 * np.sqrt(log_variance)
+    values = pd.DataFrame(
+        {
+            "penguin_count": np.expm1(log_estimate),
+            "lower": np.clip(np.expm1(log_estimate - spread), 0, None),
+            "upper": np.expm1(log_estimate + spread),
+            # Log-normal variance on the count scale, so totals can add it up
+            "variance": np.expm1(log_variance)
+            * np.exp(2 * log_estimate + log_variance),
+            "source": pd.Categorical.from_codes(source, SOURCES),
+        },
+        # Built from codes: the site and species levels are shared with
+        # series_index rather than repeated per row
+        index=pd.MultiIndex(
+            levels=[*series_index.levels, np.arange(years.min(), years.max() + 1)],
+            codes=[
+                *(codes[dense_series] for codes in series_index.codes),
+                dense_years - years.min(),
+            ],
+            names=["site_name", "common_name", "year"],
+        ),
+    )
+
+    return Panel(
+        values=values,
+        totals=panel_totals(values, []),
+        by_species=panel_totals(values, ["common_name"]),
+    )
+
+
+def panel_totals(values, keys):
+    """Sum the panel per ``keys`` and year, with a 95% band on each total.
+
+    ``observed_share`` is the part of each total that was actually counted
+    that year rather than imputed.  Years with nothing counted are left out.
+    """
+    observed = values["penguin_count"].where(values["source"] == "observed", 0.0)
+    grouped = values.assign(observed=observed).groupby(
+        [values.index.get_level_values(key) for key in keys + ["year"]],
+        observed=True,
+    )
+    totals = grouped[["penguin_count", "variance", "observed"]].sum()
+    totals = totals[totals["observed"] > 0]
+    spread = Z_95 * np.sqrt(totals["variance"])
+    totals["lower"] = (totals["penguin_count"] - spread).clip(lower=0)
+    totals["upper"] = totals["penguin_count"] + spread
+    totals["observed_share"] = totals["observed"] / totals["penguin_count"]
+    return totals[TOTAL_COLUMNS]
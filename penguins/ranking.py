@@ -0,0 +1,87 @@
+"""Site rankings laid out so any top-k view is a slice.
+
+Sites are ordered once by total count, and their per-species rows are
+stored in the same order, each site's rows contiguous.  The top k sites are
+then the first k rows, and their species breakdown is the first
+``offsets[k]`` species rows.  Other metrics keep a precomputed order of
+site positions, so their top k is a k-row take.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# metric -> (column of RankingIndex.sites, best first when descending)
+METRICS = {
+    "total": ("total_count", True),
+    "richness": ("species_richness", True),
+    # Coefficient of variation of the cell counts: lower is more stable
+    "stability": ("variation", False),
+    # Fitted slope of the yearly totals: fastest growing first
+    "trend": ("slope", True),
+}
+
+
+class RankingIndex(NamedTuple):
+    sites: pd.DataFrame  # one row per site, largest total first
+    species: pd.DataFrame  # per-(site, species) rows in ``sites`` order
+    offsets: np.ndarray  # species rows of sites.iloc[i]: offsets[i]:offsets[i + 1]
+    orders: dict  # metric -> site positions, best first
+
+
+def _order(values, names, descending):
+    """Positions of ``values`` best first; ties by site name, NaN last."""
+    keys = -values if descending else values
+    by_name = np.argsort(np.argsort(names, kind="stable"), kind="stable")
+    return np.lexsort((by_name, np.where(np.isnan(keys), np.inf, keys)))
+
+
+def build_ranking_index(by_site, by_site_species, site_trends, totals=None):
+    """Build the :class:`RankingIndex` of a release.
+
+    ``by_site`` and ``by_site_species`` are the cube roll-ups and
+    ``site_trends`` the per-site trend table.  ``totals`` is the site ranking
+    kept by the ingest snapshot (largest first); without it the sites are
+    sorted here.
+    """
+    if totals is None:
+        totals = by_site["sum"].sort_values(ascending=False, kind="stable")
+    names = totals.index
+    sites = pd.DataFrame(
+        {
+            "site_name": names,
+            "total_count": totals.to_numpy(),
+            "species_richness": by_site["species_richness"].reindex(names).to_numpy(),
+            "variation": (by_site["std"] / by_site["mean"]).reindex(names).to_numpy(),
+            "slope": site_trends["slope"].reindex(names).to_numpy(),
+        }
+    )
+
+    species = by_site_species["sum"].rename("penguin_count").reset_index()
+    rank = pd.Series(np.arange(len(names)), index=names)
+    position = rank.reindex(species["site_name"]).to_numpy()
+    species = species.iloc[np.argsort(position, kind="stable")].reset_index(drop=True)
+    offsets = np.searchsorted(np.sort(position), np.arange(len(names) + 1))
+
+    orders = {
+        metric: _order(
+            sites[column].to_numpy(dtype="float64"),
+            sites["site_name"].to_numpy(dtype="object"),
+            descending,
+        )
+        for metric, (column, descending) in METRICS.items()
+    }
+    return RankingIndex(sites=sites, species=species, offsets=offsets, orders=orders)
+
+
+def top_sites(index, k, metric="total"):
+    """The ``k`` best sites by ``metric``, best first."""
+    if metric == "total":
+        return index.sites.iloc[:k]
+    return index.sites.iloc[index.orders[metric][:k]]
+
+
+def top_species(index, k):
+    """Per-species counts of the ``k`` largest sites, site by site."""
+    return index.species.iloc[: index.offsets[min(k, len(index.sites))]]
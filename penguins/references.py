@@ -0,0 +1,113 @@
+"""Deduplicated bibliography for the AllCounts ``reference`` column.
+
+MAPPPD repeats the same R-printed bibtex record (``</sub>field [1] "value"``
+segments with HTML entities) on every observation that cites it.  Each
+distinct record is parsed once into structured fields, and observations only
+carry an integer ``reference_id`` into that table.
+"""
+
+import html
+import re
+
+import pandas as pd
+
+FIELDS = ["author", "title", "journal", "year", "url", "doi", "bibtype", "key"]
+
+# Where a record has no journal, the most useful "published in" field instead
+VENUE_FALLBACKS = ["journal", "booktitle", "institution", "publisher"]
+
+_ATTR = re.compile(r'attr\(\s*"(\w+)"\)\s*\[\d+\]\s*"([^"]*)"')
+_FIELD = re.compile(r"^\s*`?([\w-]+)`?\s*(.*)$", re.DOTALL)
+_VALUE = re.compile(r'"([^"]*)"')
+_LATEX_COMMAND = re.compile(r"\\[a-zA-Z]+")
+
+
+def _clean(value):
+    value = html.unescape(value)
+    value = _LATEX_COMMAND.sub(" ", value).replace("{", "").replace("}", "")
+    return " ".join(value.split())
+
+
+def parse_reference(raw):
+    """Parse one escaped bibtex record into a dict of ``FIELDS``."""
+    raw = raw if isinstance(raw, str) else ""
+    attrs = dict(_ATTR.findall(raw))
+    fields = {}
+    for segment in _ATTR.sub("", raw).split("</sub>"):
+        match = _FIELD.match(segment)
+        if match:
+            name, rest = match.groups()
+            fields[name.lower()] = [_clean(value) for value in _VALUE.findall(rest)]
+
+    def first(name):
+        values = fields.get(name)
+        return values[0] if values else None
+
+    doi = first("doi")
+    url = first("bdsk-url-1") or (f"https://doi.org/{doi}" if doi else None)
+    authors = fields.get("author") or fields.get("editor") or []
+    return {
+        "author": "; ".join(authors) or None,
+        "title": first("title"),
+        "journal": next(filter(None, map(first, VENUE_FALLBACKS)), None),
+        "year": first("year"),
+        "url": url,
+        "doi": doi,
+        "bibtype": attrs.get("bibtype"),
+        "key": attrs.get("key"),
+    }
+
+
+def intern_references(references):
+    """Split a raw reference column into row ids and the unique records.
+
+    Returns ``(reference_id, raw_records)`` where ``reference_id`` is an int32
+    array aligned with ``references`` (int16 would silently wrap past 32767
+    distinct records) and ``raw_records`` holds each distinct record once, in
+    id order.
+    """
+    codes, uniques = pd.factorize(references, sort=False)
+    return codes.astype("int32"), pd.Series(uniques, name="raw", dtype="object")
+
+
+def build_reference_table(raw_records):
+    """Parse each unique record into a frame indexed by ``reference_id``."""
+    table = pd.DataFrame([parse_reference(raw) for raw in raw_records], columns=FIELDS)
+    table.index.name = "reference_id"
+    return table
+
+
+def short_citation(record):
+    """Format a record as ``Surname et al. (year) Title. Journal.``"""
+    surnames = [
+        author.split(" ")[-1] for author in (record.get("author") or "").split("; ")
+    ]
+    surnames = [name for name in surnames if name]
+    if not surnames:
+        lead = "Unknown"
+    elif len(surnames) > 2:
+        lead = f"{surnames[0]} et al."
+    else:
+        lead = " & ".join(surnames)
+    parts = [f"{lead} ({record.get('year') or 'n.d.'})"]
+    if record.get("title"):
+        parts.append(record["title"])
+    if record.get("journal"):
+        parts.append(record["journal"])
+    return ". ".join(parts) + "."
+
+
+def citation(table, reference_id):
+    """Look up the short citation for one ``reference_id`` (``None`` if absent)."""
+    if reference_id is None or reference_id < 0 or reference_id not in table.index:
+        return None
+    return short_citation(table.loc[reference_id].to_dict())
+
+
+def citations(table, reference_ids):
+    """Short citations for several ids, deduplicated, in first-seen order."""
+    return [
+        text
+        for text in (citation(table, ref) for ref in pd.unique(reference_ids))
+        if text is not None
+    ]
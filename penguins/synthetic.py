@@ -0,0 +1,300 @@
+"""Synthetic AllCounts-shaped data for load and capacity testing.
+
+A small generative model is fitted to the real file: the (site, species)
+pairs with their real coordinates, the empirical distributions of survey
+series length, first survey year and gaps between surveys, count type and
+accuracy (conditional on species and count type respectively), vantage and
+survey day/month, and a log-normal count model with a per-series log-linear
+trend.  Series are then sampled from that model and streamed to CSV or
+Parquet in fixed-size chunks, so memory stays bounded at any row count::
+
+    python -m penguins.synthetic --rows 1000000 --output allcounts_1m.parquet
+
+Once every real (site, species) pair has been used, further series go to
+"virtual" clones of the real sites (``"<site> #2"``) at slightly jittered
+coordinates.
+"""
+
+import argparse
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from penguins import trends
+
+SOURCE_CSV = "./AllCounts_V_4_1.csv"
+
+COLUMNS = [
+    "site_name",
+    "site_id",
+    "cammlr_region",
+    "longitude_epsg_4326",
+    "latitude_epsg_4326",
+    "common_name",
+    "day",
+    "month",
+    "year",
+    "season_starting",
+    "penguin_count",
+    "accuracy",
+    "count_type",
+    "vantage",
+    "reference",
+]
+
+PAIR_KEYS = ["site_name", "common_name"]
+
+
+class SyntheticModel(NamedTuple):
+    # One row per real (site, species): attributes, survey count, first year,
+    # log level and log-linear slope
+    pairs: pd.DataFrame
+    gaps: np.ndarray  # each pair's real gaps between surveys, in pair order
+    max_log_count: float
+    slope_std: float
+    noise_std: float
+    count_types: pd.DataFrame  # P(count_type | species)
+    accuracy: pd.DataFrame  # P(accuracy | count_type), NaN accuracy included
+    vantage: pd.Series
+    day_month: pd.DataFrame  # observed (day, month) rows, NaN included
+    references: pd.Series  # reference text weighted by how often it is cited
+    missing_rate: float
+
+
+def _distribution(values):
+    """Value -> probability, counting missing values as their own category."""
+    return values.value_counts(normalize=True, dropna=False)
+
+
+def fit_model(raw):
+    """Fit a :class:`SyntheticModel` to a raw AllCounts frame."""
+    raw = raw.sort_values(PAIR_KEYS + ["year"], kind="stable")
+    grouped = raw.groupby(PAIR_KEYS, sort=True)
+    pairs = grouped[
+        ["site_id", "cammlr_region", "longitude_epsg_4326", "latitude_epsg_4326"]
+    ].first()
+    pairs["length"] = grouped.size()
+    pairs["first_year"] = grouped["year"].min()
+    pairs["gap_start"] = pairs["length"].cumsum() - pairs["length"]
+
+    counted = raw.dropna(subset=["penguin_count"])
+    log_count = np.log1p(counted["penguin_count"].to_numpy(dtype="float64"))
+    years = counted["year"].to_numpy(dtype="float64")
+    codes = counted.groupby(PAIR_KEYS, sort=True).ngroup().to_numpy()
+    fit = trends.fit_ols(years, log_count, codes)
+    residual = log_count - (fit["intercept"][codes] + fit["slope"][codes] * years)
+    enough = fit["n"] >= 3
+
+    # A pair's level is its mean log count; never-counted pairs take the
+    # mean level of their species
+    levels = counted.assign(log_count=log_count).groupby(PAIR_KEYS)["log_count"].mean()
+    pairs["level"] = levels.reindex(pairs.index)
+    species_level = pairs.groupby(level="common_name")["level"].transform("mean")
+    pairs["level"] = pairs["level"].fillna(species_level)
+
+    slopes = fit["slope"][enough & np.isfinite(fit["slope"])]
+    low, high = np.quantile(slopes, [0.05, 0.95])
+    pair_slopes = pd.Series(fit["slope"], index=levels.index).where(enough)
+    pairs["slope"] = pair_slopes.reindex(pairs.index).clip(low, high).fillna(0)
+
+    return SyntheticModel(
+        pairs=pairs.reset_index(),
+        gaps=grouped["year"].diff().fillna(0).to_numpy(dtype="int64"),
+        max_log_count=float(log_count.max()),
+        slope_std=float(np.std(np.clip(slopes, low, high))),
+        noise_std=float(np.nanstd(residual[enough[codes]])),
+        count_types=pd.crosstab(
+            raw["common_name"], raw["count_type"], normalize="index"
+        ),
+        accuracy=pd.crosstab(
+            raw["count_type"], raw["accuracy"].fillna(-1), normalize="index"
+        ),
+        vantage=_distribution(raw["vantage"]),
+        day_month=raw[["day", "month"]].reset_index(drop=True),
+        references=_distribution(raw["reference"]),
+        missing_rate=float(raw["penguin_count"].isna().mean()),
+    )
+
+
+def _sample(rng, distribution, size):
+    return rng.choice(distribution.index.to_numpy(), size=size, p=distribution.values)
+
+
+def _sample_conditional(rng, table, given):
+    """Sample one column label of ``table`` per row label in ``given``."""
+    out = np.empty(len(given), dtype=object)
+    for label, rows in pd.Series(np.arange(len(given))).groupby(given):
+        out[rows.to_numpy()] = _sample(rng, table.loc[label], len(rows))
+    return out
+
+
+class _SeriesPlan:
+    """Hands out (site, species) pairs: every real pair once, then clones.
+
+    A series keeps its pair's real number of surveys, so the species mix and
+    the spread of series lengths follow the real file.
+    """
+
+    def __init__(self, lengths, rng):
+        self.lengths = lengths
+        self.rng = rng
+        self.order = rng.permutation(len(lengths))
+        self.used = 0
+        self.clone = 0
+
+    def take(self, rows):
+        """Pairs, clone numbers and lengths of series covering ``rows`` rows."""
+        pair_index, clone = [], []
+        while rows > 0:
+            pending = self.order[self.used :]
+            step = min(
+                np.searchsorted(np.cumsum(self.lengths[pending]), rows) + 1,
+                len(pending),
+            )
+            pair_index.append(pending[:step])
+            clone.append(np.full(step, self.clone))
+            rows -= self.lengths[pending[:step]].sum()
+            self.used += step
+            if self.used == len(self.lengths):
+                self.order = self.rng.permutation(len(self.lengths))
+                self.used = 0
+                self.clone += 1
+        return np.concatenate(pair_index), np.concatenate(clone)
+
+
+def _generate_chunk(model, plan, rng, rows):
+    pair_index, clone = plan.take(rows)
+    pairs = model.pairs.iloc[pair_index].reset_index(drop=True)
+    lengths = pairs["length"].to_numpy()
+    # The last series is cut short so the chunk has exactly ``rows`` rows
+    lengths[-1] -= lengths.sum() - rows
+    n_series = len(lengths)
+    series = np.repeat(np.arange(n_series), lengths)
+    starts = np.cumsum(lengths) - lengths
+
+    # Survey years: the pair's real first year plus its real gaps between
+    # surveys in shuffled order, so spans and gap sizes match the real series
+    within = np.arange(rows) - np.repeat(starts, lengths)
+    gaps = model.gaps[np.repeat(pairs["gap_start"].to_numpy(), lengths) + within]
+    shuffle = np.lexsort((np.where(within == 0, -1, rng.random(rows)), series))
+    offsets = np.cumsum(gaps[shuffle])
+    offsets -= np.repeat(offsets[starts], lengths)
+    first = pairs["first_year"].to_numpy()
+    years = np.repeat(first, lengths) + offsets
+
+    # Counts: the pair's log-normal level and log-linear trend, perturbed for
+    # clones, plus observation noise
+    species = pairs["common_name"].to_numpy()
+    cloned = clone > 0
+    series_level = pairs["level"].to_numpy() + cloned * rng.normal(
+        0, model.noise_std, size=n_series
+    )
+    slope = pairs["slope"].to_numpy() + cloned * rng.normal(
+        0, model.slope_std / 4, size=n_series
+    )
+    centre = np.repeat(first + offsets[starts + lengths - 1] / 2, lengths)
+    log_count = (
+        np.repeat(series_level, lengths)
+        + np.repeat(slope, lengths) * (years - centre)
+        + rng.normal(0, model.noise_std, size=rows)
+    )
+    counts = np.round(np.expm1(np.clip(log_count, 0, model.max_log_count))).astype(
+        "float64"
+    )
+    counts[rng.random(rows) < model.missing_rate] = np.nan
+
+    species_rows = np.repeat(species, lengths)
+    count_type = _sample_conditional(rng, model.count_types, species_rows)
+    accuracy = _sample_conditional(rng, model.accuracy, count_type).astype("float64")
+    accuracy[accuracy < 0] = np.nan
+    accuracy[np.isnan(counts)] = np.nan
+    day_month = model.day_month.iloc[rng.integers(len(model.day_month), size=rows)]
+
+    site_rows = pairs.iloc[series]
+    clone_rows = clone[series]
+    suffix = np.where(
+        clone_rows > 0, np.char.add(" #", (clone_rows + 1).astype(str)), ""
+    )
+    # Each clone of a site sits at a fixed offset of up to ~0.05 degrees
+    jitter = ((clone_rows * 0.618034) % 1 - 0.5) * 0.1
+
+    return pd.DataFrame(
+        {
+            "site_name": np.char.add(site_rows["site_name"].to_numpy(str), suffix),
+            "site_id": np.char.add(
+                site_rows["site_id"].to_numpy(str),
+                np.where(clone_rows > 0, (clone_rows + 1).astype(str), ""),
+            ),
+            "cammlr_region": site_rows["cammlr_region"].to_numpy(),
+            "longitude_epsg_4326": np.round(
+                site_rows["longitude_epsg_4326"].to_numpy() + jitter, 3
+            ),
+            "latitude_epsg_4326": np.round(
+                site_rows["latitude_epsg_4326"].to_numpy() + jitter, 3
+            ),
+            "common_name": species_rows,
+            "day": day_month["day"].to_numpy(),
+            "month": day_month["month"].to_numpy(),
+            "year": years,
+            "season_starting": years,
+            "penguin_count": counts,
+            "accuracy": accuracy,
+            "count_type": count_type,
+            "vantage": _sample(rng, model.vantage, rows),
+            "reference": _sample(rng, model.references, rows),
+        },
+        columns=COLUMNS,
+    )
+
+
+def generate(model, rows, seed=0, chunk_rows=100_000):
+    """Yield synthetic AllCounts chunks totalling exactly ``rows`` rows."""
+    rng = np.random.default_rng(seed)
+    plan = _SeriesPlan(model.pairs["length"].to_numpy(), rng)
+    remaining = rows
+    while remaining > 0:
+        size = min(chunk_rows, remaining)
+        yield _generate_chunk(model, plan, rng, size)
+        remaining -= size
+
+
+def write(model, rows, path, seed=0, chunk_rows=100_000):
+    """Stream ``rows`` synthetic rows to a ``.csv`` or ``.parquet`` file."""
+    chunks = generate(model, rows, seed, chunk_rows)
+    if path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table.cast(writer.schema))
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        with open(path, "w", newline="") as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, index=False, header=i == 0)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic AllCounts data")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--output", required=True, help=".csv or .parquet path")
+    parser.add_argument("--source", default=SOURCE_CSV)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    model = fit_model(pd.read_csv(args.source))
+    write(model, args.rows, args.output, args.seed, args.chunk_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Startup timings and opt-in hot-path instrumentation.
+
+Heavy modules are imported through :func:`timed_import` at the point a
+section first needs them, and loaders are wrapped with :func:`timed_load`.
+The first (cold) duration of each is kept for the lifetime of the process,
+which is what a freshly started replica pays before its first paint.
+
+For finer detail a session can :func:`activate` a :class:`Profile`.  Every
+loader call then records its duration and whether the cache was hit, and
+named :func:`block` sections record their duration, the rows they scanned
+and the DataFrame copies they made.  With no active profile, :func:`block`
+hands back a shared no-op object, so the instrumented app runs at full
+speed.
+"""
+
+import contextvars
+import functools
+import importlib
+import io
+import sys
+import time
+from collections import deque
+
+import pandas as pd
+
+# (kind, name) -> milliseconds of the first, cold call in this process
+_startup = {}
+
+# The profile of the session whose script is running in this context
+_profile = contextvars.ContextVar("penguin_profile", default=None)
+
+# Oldest records are dropped beyond this, so a long session stays bounded
+MAX_RECORDS = 20_000
+
+RECORD_COLUMNS = [
+    "run",
+    "kind",
+    "name",
+    "ms",
+    "cache",
+    "rows_scanned",
+    "copies",
+    "copy_rows",
+]
+
+
+def _record(kind, name, started):
+    _startup.setdefault((kind, name), (time.perf_counter() - started) * 1000)
+
+
+def timed_import(module_name):
+    """Import ``module_name``, recording how long the first import took."""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    _record("import", module_name, started)
+    return module
+
+
+def _frames(result):
+    """The DataFrames in a loader result (a frame or a tuple of them)."""
+    if isinstance(result, pd.DataFrame):
+        return [result]
+    if isinstance(result, tuple):
+        return [item for item in result if isinstance(item, pd.DataFrame)]
+    return []
+
+
+def timed_load(name, cache=None, shared=False):
+    """Decorator recording the first call duration of a data loader.
+
+    ``cache`` is an optional caching decorator such as ``st.cache_data``.  It
+    is applied beneath the timing so an active :class:`Profile` can tell
+    cache hits (the loader body did not run) from misses.  ``shared`` marks
+    a cache that hands back the cached object itself (``st.cache_resource``)
+    rather than a copy.
+    """
+
+    def decorator(func):
+        if cache is None:
+            loader = func
+        else:
+
+            @functools.wraps(func)
+            def body(*args, **kwargs):
+                profile = _profile.get()
+                if profile is not None and profile._pending:
+                    profile._pending[-1] = True
+                return func(*args, **kwargs)
+
+            loader = cache(body)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = _profile.get()
+            if profile is None and ("load", name) in _startup:
+                return loader(*args, **kwargs)
+            started = time.perf_counter()
+            if profile is not None:
+                profile._pending.append(False)
+            try:
+                result = loader(*args, **kwargs)
+            finally:
+                missed = profile._pending.pop() if profile is not None else None
+            _record("load", name, started)
+            if profile is not None:
+                status = None if cache is None else "miss" if missed else "hit"
+                # A copying cache hit hands back a fresh copy of every frame
+                copied = _frames(result) if status == "hit" and not shared else []
+                profile.record(
+                    "load",
+                    name,
+                    (time.perf_counter() - started) * 1000,
+                    cache=status,
+                    copies=len(copied),
+                    copy_rows=sum(len(frame) for frame in copied),
+                )
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def startup_report():
+    """The recorded import and load timings, slowest first."""
+    rows = [(kind, name, ms) for (kind, name), ms in _startup.items()]
+    report = pd.DataFrame(rows, columns=["kind", "name", "ms"])
+    return report.sort_values("ms", ascending=False, ignore_index=True)
+
+
+class Profile:
+    """Instrumentation records for one session, kept across its reruns."""
+
+    def __init__(self, max_records=MAX_RECORDS):
+        self.run = 0
+        self.records = deque(maxlen=max_records)
+        # One flag per loader call in progress, set when its body runs
+        self._pending = []
+
+    def start_run(self):
+        self.run += 1
+
+    def record(self, kind, name, ms, cache=None, rows_scanned=0, copies=0, copy_rows=0):
+        self.records.append(
+            (self.run, kind, name, ms, cache, rows_scanned, copies, copy_rows)
+        )
+
+    def frame(self):
+        return pd.DataFrame(list(self.records), columns=RECORD_COLUMNS)
+
+    def run_report(self, run=None):
+        """Blocks and loads of one run (the latest by default), slowest first."""
+        records = self.frame()
+        records = records[records["run"] == (self.run if run is None else run)]
+        report = records.groupby(["kind", "name"], as_index=False, sort=False).agg(
+            calls=("ms", "size"),
+            ms=("ms", "sum"),
+            rows_scanned=("rows_scanned", "sum"),
+            copies=("copies", "sum"),
+            copy_rows=("copy_rows", "sum"),
+        )
+        return report.sort_values("ms", ascending=False, ignore_index=True)
+
+    def cache_report(self):
+        """Hits, misses and hit rate of each cached loader over the session."""
+        loads = self.frame().dropna(subset=["cache"])
+        report = (
+            pd.crosstab(loads["name"], loads["cache"])
+            .reindex(columns=["hit", "miss"], fill_value=0)
+            .rename(columns={"hit": "hits", "miss": "misses"})
+        )
+        report["hit_rate"] = report["hits"] / (report["hits"] + report["misses"])
+        report.columns.name = None
+        return report.rename_axis("loader").reset_index()
+
+    def to_json(self):
+        return self.frame().to_json(orient="records", indent=2)
+
+    def to_csv(self):
+        buffer = io.StringIO()
+        self.frame().to_csv(buffer, index=False)
+        return buffer.getvalue()
+
+
+def activate(profile):
+    """Make ``profile`` (or None, to switch instrumentation off) current."""
+    _profile.set(profile)
+
+
+def active_profile():
+    return _profile.get()
+
+
+class _Block:
+    __slots__ = ("profile", "name", "started", "rows_scanned", "copies", "copy_rows")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+        self.rows_scanned = 0
+        self.copies = 0
+        self.copy_rows = 0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.record(
+            "block",
+            self.name,
+            (time.perf_counter() - self.started) * 1000,
+            rows_scanned=self.rows_scanned,
+            copies=self.copies,
+            copy_rows=self.copy_rows,
+        )
+
+    def scanned(self, rows):
+        """Note that the block read ``rows`` input rows."""
+        self.rows_scanned += rows
+
+    def copied(self, frame):
+        """Note that the block materialised ``frame`` as a new DataFrame."""
+        self.copies += 1
+        self.copy_rows += len(frame)
+
+
+class _NullBlock:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def scanned(self, rows):
+        pass
+
+    def copied(self, frame):
+        pass
+
+
+_NULL_BLOCK = _NullBlock()
+
+
+def block(name):
+    """Context manager timing a named section of a rerun when profiling."""
+    profile = _profile.get()
+    return _NULL_BLOCK if profile is None else _Block(profile, name)
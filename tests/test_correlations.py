@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from penguins import climate, correlations, panel
+
+YEARS = np.arange(1961, 2024)
+
+
+@pytest.fixture
+def inputs():
+    """Four colonies in two regions, one entering late, and three climates."""
+    rng = np.random.default_rng(0)
+    colonies = [
+        ("a", "adelie penguin", YEARS),
+        ("b", "adelie penguin", YEARS[YEARS >= 1985]),
+        ("c", "adelie penguin", YEARS),
+        ("d", "gentoo penguin", YEARS),
+    ]
+    frames = []
+    for site, species, years in colonies:
+        log_count = 6 + np.cumsum(rng.normal(0, 0.1, len(years)))
+        frames.append(
+            pd.DataFrame(
+                {
+                    "site_name": site,
+                    "common_name": species,
+                    "year": years,
+                    "penguin_count": np.expm1(log_count),
+                    "variance": 0.0,
+                    "source": pd.Categorical(["observed"] * len(years), panel.SOURCES),
+                }
+            )
+        )
+    values = pd.concat(frames).set_index(["site_name", "common_name", "year"])
+    sites = pd.DataFrame(
+        {"cammlr_region": ["48.1", "48.1", "48.2", "48.1"]},
+        index=pd.Index(["a", "b", "c", "d"], name="site_name"),
+    )
+    temperature = np.cumsum(rng.normal(0.02, 0.3, (3, len(YEARS))), axis=1)
+    temperature[1, :5] = np.nan
+    series_info = pd.DataFrame(
+        {"Country": ["Antarctica", "Chile", "World"], "Unit": "Degree Celsius"},
+        index=pd.MultiIndex.from_tuples(
+            [("ATATMP", "T"), ("CHL", "T"), ("WLD", "T")], names=["ISO3", "Indicator"]
+        ),
+    )
+    matrix = climate.ClimateMatrix(
+        values=temperature.astype("float32"), years=YEARS, series_info=series_info
+    )
+    return panel.Panel(values, None, None), sites, matrix
+
+
+def _growth(values, sites, species, region):
+    """Change in log1p of the total over colonies present in both years."""
+    counts = values.xs(species, level="common_name")["penguin_count"].unstack("year")
+    counts = counts[sites["cammlr_region"].reindex(counts.index) == region]
+    counts = counts.reindex(columns=YEARS)
+    both = counts.notna() & counts.shift(axis=1).notna()
+    current = counts.where(both).sum()
+    previous = counts.shift(axis=1).where(both).sum()
+    return (np.log1p(current) - np.log1p(previous)).iloc[1:]
+
+
+def _corr(x, z):
+    x, z = pd.Series(x), pd.Series(z)
+    present = x.notna() & z.notna()
+    return x.corr(z) if present.sum() >= correlations.MIN_YEARS else np.nan
+
+
+def test_correlate_matches_pandas():
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=(3, 30))
+    z = rng.normal(size=(4, 30))
+    x[0, :8] = np.nan
+    z[1, ::2] = np.nan
+    z[2, :25] = np.nan
+    r, n = correlations._correlate(x, z)
+    for i in range(3):
+        for j in range(4):
+            expected = _corr(x[i], z[j])
+            assert n[i, j] == (np.isfinite(x[i]) & np.isfinite(z[j])).sum()
+            if np.isnan(expected):
+                assert np.isnan(r[i, j])
+            else:
+                assert r[i, j] == pytest.approx(expected)
+
+
+def test_population_growth_is_chain_linked(inputs):
+    population_panel, sites, matrix = inputs
+    growth, populations = correlations.population_growth(
+        population_panel.values, sites, matrix.years
+    )
+    for row, (species, region) in enumerate(populations.index):
+        np.testing.assert_allclose(
+            growth[row], _growth(population_panel.values, sites, species, region)
+        )
+
+
+def test_lagged_and_rolling_correlations_match_pandas(inputs):
+    population_panel, sites, matrix = inputs
+    result = correlations.build_correlations(population_panel, sites, matrix)
+    warming = np.diff(matrix.values.astype("float64"), axis=1)
+
+    for row, (species, region) in enumerate(result.populations.index):
+        growth = _growth(population_panel.values, sites, species, region).to_numpy()
+        for column in range(len(matrix.series_info)):
+            for lag in range(correlations.MAX_LAG + 1):
+                expected = _corr(
+                    growth[lag:], warming[column, : len(warming[column]) - lag]
+                )
+                np.testing.assert_allclose(
+                    result.lagged[row, column, lag], expected, equal_nan=True
+                )
+
+            lag = result.best_lag[row, column]
+            assert lag == np.nanargmax(np.abs(result.lagged[row, column]))
+            shifted = pd.Series(warming[column]).shift(lag).to_numpy()
+            for window, end in enumerate(result.window_ends):
+                stop = end - YEARS[0]
+                start = stop - correlations.WINDOW
+                np.testing.assert_allclose(
+                    result.rolling[row, column, window],
+                    _corr(growth[start:stop], shifted[start:stop]),
+                    equal_nan=True,
+                )
+
+
+def test_region_ranking_orders_by_strength(inputs):
+    result = correlations.build_correlations(*inputs)
+    ranking = correlations.region_ranking(result, "ATATMP")
+    strength = ranking["correlation"].abs()
+    assert strength.is_monotonic_decreasing
+    assert list(ranking.columns) == correlations.RANKING_COLUMNS
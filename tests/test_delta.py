@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from penguins import delta, ingest
+
+SOURCE_CSV = os.path.join(os.path.dirname(__file__), "..", "AllCounts_V_4_1.csv")
+
+
+@pytest.fixture(scope="module")
+def monkeypatch_module():
+    with pytest.MonkeyPatch.context() as patch:
+        yield patch
+
+
+@pytest.fixture(scope="module")
+def releases(tmp_path_factory, monkeypatch_module):
+    """The real release and a revision with updated, deleted and new rows."""
+    monkeypatch_module.setattr(
+        ingest, "CACHE_DIR", str(tmp_path_factory.mktemp("cache"))
+    )
+    old = ingest.load_observations(SOURCE_CSV)
+    reference_text = ingest.load_references(SOURCE_CSV, raw=True)["raw"]
+
+    rng = np.random.default_rng(0)
+    new = old.copy()
+    new.loc[rng.random(len(new)) < 0.02, "penguin_count"] += 5
+    new = new[rng.random(len(new)) >= 0.01]
+    inserted = old.sample(20, random_state=0).assign(year=2030)
+    new = pd.concat([new, inserted], ignore_index=True)
+    return old, reference_text, new, reference_text
+
+
+def test_diff_finds_every_kind_of_change(releases):
+    change = delta.diff_observations(*releases)
+    counts = delta.summary(change)
+    assert counts["inserted"] > 0
+    assert counts["updated"] > 0
+    assert counts["deleted"] > 0
+
+
+def test_update_matches_a_full_rebuild(releases):
+    old, old_references, new, new_references = releases
+    change = delta.diff_observations(old, old_references, new, new_references)
+    updated = delta.update_snapshot(delta.build_snapshot(old), new, change)
+    rebuilt = delta.build_snapshot(new)
+
+    for name in rebuilt.cube._fields:
+        pd.testing.assert_frame_equal(
+            getattr(updated.cube, name), getattr(rebuilt.cube, name), obj=name
+        )
+    for name in rebuilt.trend_tables._fields:
+        pd.testing.assert_frame_equal(
+            getattr(updated.trend_tables, name),
+            getattr(rebuilt.trend_tables, name),
+            obj=name,
+        )
+    pd.testing.assert_series_equal(updated.rankings, rebuilt.rankings)
+
+
+def test_unchanged_release_keeps_the_snapshot(releases):
+    old, reference_text, _, _ = releases
+    snapshot = delta.build_snapshot(old)
+    change = delta.diff_observations(old, reference_text, old, reference_text)
+    assert delta.update_snapshot(snapshot, old, change) is snapshot
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from penguins import panel
+
+SURVEYS = {
+    ("A", "adelie penguin"): {2000: 100, 2004: 200, 2010: 150},
+    ("B", "adelie penguin"): {1995: 50, 1996: 60},
+    ("A", "gentoo penguin"): {2005: 10, 2008: 40},
+}
+
+
+@pytest.fixture
+def built():
+    rows = [
+        (site, species, year, total)
+        for (site, species), counts in SURVEYS.items()
+        for year, total in counts.items()
+    ]
+    cells = pd.DataFrame(
+        rows, columns=["site_name", "common_name", "year", "sum"]
+    ).set_index(["site_name", "common_name", "year"])
+    cells["count"] = 1
+    models = pd.DataFrame(
+        {"shrunk_slope": [0.05]},
+        index=pd.MultiIndex.from_tuples(
+            [("A", "adelie penguin")], names=["site_name", "common_name"]
+        ),
+    )
+    return panel.build_panel(cells, models)
+
+
+def _walk(species):
+    """Mean squared change in log1p per year between consecutive surveys."""
+    change = step = 0.0
+    for (_, name), counts in SURVEYS.items():
+        if name == species:
+            years = sorted(counts)
+            logs = np.log1p([counts[year] for year in years])
+            change += (np.diff(logs) ** 2).sum()
+            step += np.diff(years).sum()
+    return change / step
+
+
+def test_surveyed_years_keep_their_count(built):
+    for (site, species), counts in SURVEYS.items():
+        for year, total in counts.items():
+            row = built.values.loc[(site, species, year)]
+            assert row["penguin_count"] == pytest.approx(total)
+            assert row["source"] == "observed"
+            assert row["variance"] == 0
+
+
+def test_gaps_follow_a_brownian_bridge(built):
+    row = built.values.loc[("A", "adelie penguin", 2002)]
+    log_estimate = (np.log1p(100) + np.log1p(200)) / 2
+    log_variance = _walk("adelie penguin") * 2 * 2 / 4
+    assert row["source"] == "interpolated"
+    assert row["penguin_count"] == pytest.approx(np.expm1(log_estimate))
+    assert row["variance"] == pytest.approx(
+        np.expm1(log_variance) * np.exp(2 * log_estimate + log_variance)
+    )
+    spread = panel.Z_95 * np.sqrt(log_variance)
+    assert row["upper"] == pytest.approx(np.expm1(log_estimate + spread))
+
+
+def test_extrapolation_stops_at_the_horizon(built):
+    values = built.values
+    # Backwards along the shrunk slope, with a random walk's variance
+    row = values.loc[("A", "adelie penguin", 1997)]
+    assert row["source"] == "extrapolated"
+    assert np.log1p(row["penguin_count"]) == pytest.approx(np.log1p(100) - 0.05 * 3)
+    # No slope: the last survey's level, up to MAX_EXTRAPOLATION years out
+    last = 1996 + panel.MAX_EXTRAPOLATION
+    assert values.loc[("B", "adelie penguin", last), "penguin_count"] == (
+        pytest.approx(60)
+    )
+    assert ("B", "adelie penguin", last + 1) not in values.index
+
+
+def test_totals_only_cover_counted_years(built):
+    counted = sorted({year for counts in SURVEYS.values() for year in counts})
+    assert built.totals.index.tolist() == counted
+
+    by_year = built.values.groupby(level="year")
+    totals = built.totals
+    np.testing.assert_allclose(
+        totals["penguin_count"], by_year["penguin_count"].sum().loc[counted]
+    )
+    spread = panel.Z_95 * np.sqrt(by_year["variance"].sum().loc[counted])
+    np.testing.assert_allclose(
+        totals["upper"], totals["penguin_count"] + spread.to_numpy()
+    )
+    observed = {
+        year: sum(counts.get(year, 0) for counts in SURVEYS.values())
+        for year in counted
+    }
+    np.testing.assert_allclose(
+        totals["observed_share"],
+        [observed[year] for year in counted] / totals["penguin_count"],
+    )
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from penguins import trend_models
+
+
+@pytest.fixture
+def groups():
+    """Noisy log-linear series of 2 to 15 points, some sharing a year."""
+    rng = np.random.default_rng(0)
+    sizes = rng.integers(2, 16, size=40)
+    codes = np.repeat(np.arange(len(sizes)), sizes)
+    x = rng.integers(1970, 2020, size=len(codes)).astype("float64")
+    y = 5 + rng.normal(0, 0.05, len(sizes))[codes] * (x - 1970)
+    y += rng.normal(0, 0.3, len(codes))
+    # Shuffle so the groups are not contiguous
+    order = rng.permutation(len(codes))
+    return x[order], y[order], codes[order], len(sizes)
+
+
+def test_grouped_median_matches_numpy(groups):
+    _, y, codes, n_groups = groups
+    expected = [np.median(y[codes == group]) for group in range(n_groups)]
+    np.testing.assert_allclose(
+        trend_models.grouped_median(y, codes, n_groups), expected
+    )
+
+
+def test_theil_sen_matches_scipy(groups):
+    x, y, codes, n_groups = groups
+    slopes = trend_models.theil_sen(x, y, codes, n_groups)
+    for group in range(n_groups):
+        gx, gy = x[codes == group], y[codes == group]
+        if len(np.unique(gx)) < 2:
+            assert np.isnan(slopes[group])
+        else:
+            assert slopes[group] == pytest.approx(stats.theilslopes(gy, gx).slope)
+
+
+def test_shrink_matches_method_of_moments():
+    rng = np.random.default_rng(1)
+    parents = np.repeat([0, 1, 2], [12, 8, 1])
+    slope = rng.normal([0.02, -0.01, 0.03], 0.03, (len(parents), 3))[
+        np.arange(len(parents)), parents
+    ]
+    stderr = rng.uniform(0.005, 0.05, len(parents))
+    stderr[3] = np.nan
+
+    shrunk, shrunk_stderr = trend_models.shrink(slope, stderr, parents, 3)
+
+    for parent in (0, 1):
+        rows = np.flatnonzero((parents == parent) & np.isfinite(stderr))
+        b, v = slope[rows], stderr[rows] ** 2
+        tau2 = max(b.var(ddof=1) - v.mean(), 0)
+        weight = 1 / (v + tau2)
+        centre = (weight * b).sum() / weight.sum()
+        own = tau2 / (tau2 + v)
+        np.testing.assert_allclose(shrunk[rows], centre + own * (b - centre))
+        np.testing.assert_allclose(
+            shrunk_stderr[rows], np.sqrt(own * v + (1 - own) ** 2 / weight.sum())
+        )
+    # No standard error: no estimate; a lone group: left unpooled
+    assert np.isnan(shrunk[3]) and np.isnan(shrunk_stderr[3])
+    assert shrunk[-1] == slope[-1] and shrunk_stderr[-1] == stderr[-1]
+
+
+def test_fit_trend_models_log_slopes_match_polyfit():
+    rng = np.random.default_rng(2)
+    points = pd.DataFrame(
+        {
+            "site_name": np.repeat(["a", "b", "c"], 10),
+            "year": np.tile(np.arange(2000, 2010), 3),
+            "penguin_count": rng.integers(50, 500, 30),
+        }
+    )
+    table = trend_models.fit_trend_models(points, ["site_name"])
+    for site, rows in points.groupby("site_name"):
+        slope = np.polyfit(rows["year"], np.log1p(rows["penguin_count"]), 1)[0]
+        assert table.loc[site, "log_slope"] == pytest.approx(slope)
+        assert table.loc[site, "theil_sen"] == pytest.approx(
+            stats.theilslopes(np.log1p(rows["penguin_count"]), rows["year"]).slope
+        )